@@ -0,0 +1,153 @@
+"""
+评论去重模块 - 合并完全重复和近似重复的评论，减少LLM调用
+"""
+import hashlib
+import logging
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+import jieba
+import numpy as np
+
+from sentiment_lexicon import DEFAULT_LEXICON, DEFAULT_NEGATORS
+
+jieba.setLogLevel(logging.INFO)
+
+# 保留的句末标点：问号、感叹号会改变语气（反问、讽刺与陈述），规范化时不去掉
+_KEPT_PUNCTUATION = {'?', '!'}
+
+# MinHash 使用的梅森素数 2^31 - 1，保证 int64 运算不溢出
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+class CommentDeduplicator:
+    """评论去重器（规范化文本精确匹配 + 基于jieba分词的MinHash近似匹配）"""
+    
+    def __init__(self, similarity: float = 1.0, min_tokens: int = 5,
+                 num_perm: int = 64, bands: int = 16, seed: int = 42):
+        """
+        初始化去重器
+        
+        similarity: 判定为近似重复的最小Jaccard相似度，大于等于1（默认）表示只合并完全重复；
+                    近似合并时两条评论的差异词中不能有否定词、情感词或问号/感叹号
+        min_tokens: 参与近似匹配的最少词数，过短的评论只做精确匹配
+        num_perm: MinHash 签名长度
+        bands: LSH 分段数，num_perm 需能被其整除
+        """
+        self.similarity = similarity
+        self.min_tokens = min_tokens
+        self.bands = bands
+        self.rows = num_perm // bands
+        
+        rng = np.random.RandomState(seed)
+        self._perm_a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        self._perm_b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        
+        self.last_stats = {}
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """规范化评论文本：统一全半角和大小写，去掉回复前缀、@用户、空白和标点（保留问号、感叹号）"""
+        text = unicodedata.normalize('NFKC', text).lower()
+        text = re.sub(r'^回复@[^:：]+[:：]', '', text)
+        text = re.sub(r'@[^\s:：@]+', '', text)
+        
+        kept = []
+        symbols = []
+        for ch in text:
+            category = unicodedata.category(ch)
+            if category[0] in ('L', 'N') or ch in _KEPT_PUNCTUATION:
+                kept.append(ch)
+            elif category == 'So' and ch not in symbols:
+                symbols.append(ch)
+        
+        # 纯表情评论按出现过的表情符号归并（如 “😂😂😂” 与 “😂”）
+        if not any(ch not in _KEPT_PUNCTUATION for ch in kept):
+            return ''.join(symbols)
+        return ''.join(kept)
+    
+    def group(self, texts: List[str]) -> List[int]:
+        """对评论分组，返回每条评论所属组代表评论的下标"""
+        representatives = [0] * len(texts)
+        exact_groups = {}
+        band_index = [{} for _ in range(self.bands)]
+        signatures = {}
+        token_sets = {}
+        exact_dups = 0
+        near_dups = 0
+        
+        for i, text in enumerate(texts):
+            normalized = self.normalize(text) or text.strip()
+            
+            if normalized in exact_groups:
+                representatives[i] = exact_groups[normalized]
+                exact_dups += 1
+                continue
+            
+            rep = i
+            tokens = set(jieba.lcut(normalized))
+            
+            if self.similarity < 1 and len(tokens) >= self.min_tokens:
+                signature = self._minhash(tokens)
+                band_keys = self._band_keys(signature)
+                near = self._find_near(signature, tokens, band_keys, band_index, signatures, token_sets)
+                
+                if near is None:
+                    signatures[i] = signature
+                    token_sets[i] = tokens
+                    for band, key in enumerate(band_keys):
+                        band_index[band].setdefault(key, []).append(i)
+                else:
+                    rep = near
+                    near_dups += 1
+            
+            exact_groups[normalized] = rep
+            representatives[i] = rep
+        
+        self.last_stats = {
+            'total': len(texts),
+            'unique': len(texts) - exact_dups - near_dups,
+            'exact_duplicates': exact_dups,
+            'near_duplicates': near_dups
+        }
+        
+        return representatives
+    
+    def _find_near(self, signature: np.ndarray, tokens: set, band_keys: List[bytes],
+                   band_index: List[Dict], signatures: Dict, token_sets: Dict) -> Optional[int]:
+        """通过LSH分段索引查找相似度足够高、且差异不影响情感的代表评论"""
+        checked = set()
+        for band, key in enumerate(band_keys):
+            for candidate in band_index[band].get(key, []):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if (np.mean(signatures[candidate] == signature) >= self.similarity
+                        and not any(self._is_polar(token) for token in tokens ^ token_sets[candidate])):
+                    return candidate
+        return None
+    
+    @staticmethod
+    def _is_polar(token: str) -> bool:
+        """词中是否含否定词、情感词或问号/感叹号（如 “不满意” 与 “满意”），这样的差异不能合并"""
+        return (token in _KEPT_PUNCTUATION
+                or any(word in token for word in DEFAULT_NEGATORS)
+                or any(word in token for word in DEFAULT_LEXICON))
+    
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """将MinHash签名切分为LSH分段键"""
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+    
+    def _minhash(self, tokens: set) -> np.ndarray:
+        """计算词集合的MinHash签名"""
+        hashes = np.array(
+            [int.from_bytes(hashlib.md5(token.encode('utf-8')).digest()[:4], 'little')
+             & _MERSENNE_PRIME for token in tokens],
+            dtype=np.int64
+        )
+        permuted = (np.outer(hashes, self._perm_a) + self._perm_b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
@@ -0,0 +1,200 @@
+"""
+评论列存储模块 - 以紧凑列式结构保存评论和回复，按需还原为字典
+"""
+from array import array
+from collections.abc import Sequence
+from typing import Dict, List
+import sys
+
+from data_parser import TimeIndex
+
+# 缺失值（如评论组没有 index、时间无法解析）的占位
+MISSING = -(1 << 63)
+
+
+class StringTable:
+    """字符串驻留表（相同字符串只保存一份，列中只存编号）"""
+    
+    def __init__(self):
+        self.strings = []
+        self._ids = {}
+    
+    def intern(self, text: str) -> int:
+        """返回字符串编号，首次出现时加入表中"""
+        string_id = self._ids.get(text)
+        if string_id is None:
+            string_id = len(self.strings)
+            self._ids[text] = string_id
+            self.strings.append(text)
+        return string_id
+    
+    def __getitem__(self, string_id: int) -> str:
+        return self.strings[string_id]
+    
+    def memory_usage(self) -> int:
+        """估算占用字节数"""
+        return (sys.getsizeof(self.strings) + sys.getsizeof(self._ids) +
+                sum(sys.getsizeof(text) for text in self.strings))
+
+
+class CommentStore(Sequence):
+    """
+    评论列存储
+    
+    每行是一条主评论或回复，作者/来源/用户ID/时间字符串驻留为编号，时间另存为整数秒，
+    正文以UTF-8存入共享缓冲区并记录偏移，回复通过 parent 列指向所属主评论所在行。
+    按下标访问时返回与 WeiboDataParser.extract_comments 相同结构的字典，可直接替代原列表。
+    """
+    
+    def __init__(self):
+        """初始化空存储"""
+        self.strings = StringTable()
+        
+        # 评论组列
+        self.group_index = array('q')
+        self.group_has_replies = array('b')
+        self.group_start = array('q')
+        
+        # 行列（主评论和回复）
+        self.author = array('l')
+        self.source = array('l')
+        self.user_id = array('l')
+        self.time_text = array('l')
+        self.timestamp = array('q')
+        self.parent = array('q')
+        self.text_offsets = array('Q', [0])
+        self.text_buffer = bytearray()
+        
+        self._parsed_times = {}
+    
+    def append_group(self, group: Dict):
+        """追加一个原始评论组"""
+        main_comment = group.get('main_comment', {})
+        replies = group.get('replies', [])
+        
+        index = group.get('index')
+        main_row = len(self.parent)
+        
+        self.group_index.append(MISSING if index is None else index)
+        self.group_has_replies.append(1 if group.get('has_replies', False) else 0)
+        self.group_start.append(main_row)
+        
+        self._append_row(main_comment, -1, main_comment.get('user_id', ''))
+        for reply in replies:
+            self._append_row(reply, main_row, None)
+    
+    def _append_row(self, item: Dict, parent: int, user_id):
+        """追加一行"""
+        time_text = item.get('time', '')
+        
+        if time_text in self._parsed_times:
+            timestamp = self._parsed_times[time_text]
+        else:
+            timestamp = TimeIndex.parse_time(time_text) if time_text else None
+            self._parsed_times[time_text] = timestamp
+        
+        self.author.append(self.strings.intern(item.get('author', '')))
+        self.source.append(self.strings.intern(item.get('source', '')))
+        self.user_id.append(-1 if user_id is None else self.strings.intern(user_id))
+        self.time_text.append(self.strings.intern(time_text))
+        self.timestamp.append(MISSING if timestamp is None else timestamp)
+        self.parent.append(parent)
+        
+        self.text_buffer += item.get('content', '').encode('utf-8')
+        self.text_offsets.append(len(self.text_buffer))
+    
+    def text(self, row: int) -> str:
+        """读取某行正文"""
+        return self.text_buffer[self.text_offsets[row]:self.text_offsets[row + 1]].decode('utf-8')
+    
+    def _row_dict(self, row: int) -> Dict:
+        """将一行还原为字典"""
+        data = {
+            'author': self.strings[self.author[row]],
+            'content': self.text(row),
+            'time': self.strings[self.time_text[row]],
+            'source': self.strings[self.source[row]]
+        }
+        if self.user_id[row] >= 0:
+            data['user_id'] = self.strings[self.user_id[row]]
+        return data
+    
+    def _group_rows(self, position: int) -> range:
+        """评论组占用的行范围（主评论在前，回复紧随其后）"""
+        start = self.group_start[position]
+        end = self.group_start[position + 1] if position + 1 < len(self.group_start) else len(self.parent)
+        return range(start, end)
+    
+    def __len__(self) -> int:
+        return len(self.group_start)
+    
+    def __getitem__(self, position):
+        """按下标返回评论组字典，切片返回字典列表"""
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("评论组下标越界")
+        
+        rows = self._group_rows(position)
+        replies = [self._row_dict(row) for row in rows[1:]]
+        index = self.group_index[position]
+        
+        return {
+            'index': None if index == MISSING else index,
+            'main_comment': self._row_dict(rows[0]),
+            'replies': replies,
+            'has_replies': bool(self.group_has_replies[position]),
+            'reply_count': len(replies)
+        }
+    
+    def to_list(self) -> List[Dict]:
+        """还原为字典列表"""
+        return self[:]
+    
+    def memory_usage(self) -> int:
+        """估算占用字节数"""
+        columns = [
+            self.group_index, self.group_has_replies, self.group_start,
+            self.author, self.source, self.user_id, self.time_text,
+            self.timestamp, self.parent, self.text_offsets
+        ]
+        return (sum(sys.getsizeof(column) for column in columns) +
+                sys.getsizeof(self.text_buffer) + self.strings.memory_usage())
+
+
+if __name__ == "__main__":
+    # 对比字典列表与列存储的内存占用
+    import json
+    import tracemalloc
+    from data_parser import WeiboDataParser
+    
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "weibo_comments_full.json"
+    
+    def measure(build):
+        """测量加载数据并构建结构后常驻的内存（原始JSON对象已释放）"""
+        tracemalloc.start()
+        with open(file_path, 'r', encoding='utf-8') as f:
+            groups = json.load(f).get('comment_groups', [])
+        result = build(groups)
+        del groups
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return result, current
+    
+    def build_store(groups):
+        store = CommentStore()
+        for group in groups:
+            store.append_group(group)
+        return store
+    
+    comments, list_bytes = measure(lambda groups: [WeiboDataParser._parse_group(g) for g in groups])
+    store, store_bytes = measure(build_store)
+    
+    assert store.to_list() == comments
+    
+    print(f"评论组: {len(store)}  行数: {len(store.parent)}")
+    print(f"字典列表: {list_bytes / 1024 / 1024:.2f} MB")
+    print(f"列存储:   {store_bytes / 1024 / 1024:.2f} MB ({store_bytes / list_bytes:.1%})")
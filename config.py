@@ -12,10 +12,67 @@ DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY", "")
 DASHSCOPE_BASE_URL = os.getenv("DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
 MODEL_NAME = os.getenv("MODEL_NAME", "qwen-plus")
 
+# LLM 并发配置（同时进行的请求数上限，1 表示串行）
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# LLM 限流、重试与熔断配置（每分钟请求数/token数上限，0 表示不限）
+LLM_RPM = int(os.getenv("LLM_RPM", "600"))
+LLM_TPM = int(os.getenv("LLM_TPM", "500000"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "5"))
+LLM_CIRCUIT_COOLDOWN = float(os.getenv("LLM_CIRCUIT_COOLDOWN", "30"))
+
+# 情感分析打包配置（每次请求打包的评论数，1 表示逐条分析；单次请求的估算token上限）
+SENTIMENT_PACK_SIZE = int(os.getenv("SENTIMENT_PACK_SIZE", "1"))
+SENTIMENT_PACK_TOKEN_BUDGET = int(os.getenv("SENTIMENT_PACK_TOKEN_BUDGET", "3000"))
+
+# 评论去重配置（近似重复的Jaccard相似度阈值，设为 1 表示只合并完全重复）
+COMMENT_DEDUP_ENABLED = os.getenv("COMMENT_DEDUP_ENABLED", "true").lower() == "true"
+COMMENT_DEDUP_SIMILARITY = float(os.getenv("COMMENT_DEDUP_SIMILARITY", "1.0"))
+
+# 本地词典情感预分类（置信度不低于阈值的评论不再调用LLM；本地结果不含诉求提取）
+SENTIMENT_LOCAL_ENABLED = os.getenv("SENTIMENT_LOCAL_ENABLED", "false").lower() == "true"
+SENTIMENT_LOCAL_THRESHOLD = float(os.getenv("SENTIMENT_LOCAL_THRESHOLD", "0.75"))
+SENTIMENT_LEXICON_PATH = os.getenv("SENTIMENT_LEXICON_PATH", "")
+
+# LLM 响应缓存配置（本地SQLite，按大小淘汰）
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite")
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "200"))
+
 # Neo4j 配置
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
+# Neo4j 连接池配置（进程内共享一个驱动）
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))  # 秒
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60"))  # 获取连接超时（秒）
+NEO4J_FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))  # 每次从服务端拉取的记录数
+NEO4J_TX_RETRY_SECONDS = float(os.getenv("NEO4J_TX_RETRY_SECONDS", "30"))  # 瞬时错误的事务重试时长
+
+# 图存储后端：neo4j 或 memory（进程内内存图，无需启动数据库，适合本地测试和小任务）
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "neo4j")
+# 内存图的保存路径（关闭时保存、启动时加载，留空则不持久化）
+GRAPH_MEMORY_PATH = os.getenv("GRAPH_MEMORY_PATH", "cache/memory_graph.pkl")
+
+# 知识图谱批量写入配置（每个事务写入的评论数）
+KG_BATCH_SIZE = int(os.getenv("KG_BATCH_SIZE", "500"))
+# 并行写入图谱的工作线程数（1 表示单线程，需不大于 NEO4J_MAX_POOL_SIZE）
+KG_WRITE_WORKERS = int(os.getenv("KG_WRITE_WORKERS", "1"))
+# 写入图谱的评论数上限和每条评论的回复数上限（0 表示全部写入）
+KG_MAX_COMMENTS = int(os.getenv("KG_MAX_COMMENTS", "0"))
+KG_MAX_REPLIES = int(os.getenv("KG_MAX_REPLIES", "0"))
+
+# 可视化查询结果缓存（进程内，图谱写入对应事件后自动失效；有效期单位秒）
+VIS_CACHE_ENABLED = os.getenv("VIS_CACHE_ENABLED", "true").lower() == "true"
+VIS_CACHE_TTL = float(os.getenv("VIS_CACHE_TTL", "60"))
+
+# 数据解析配置（输入文件超过该大小时自动使用流式解析，单位MB）
+STREAMING_PARSE_THRESHOLD_MB = float(os.getenv("STREAMING_PARSE_THRESHOLD_MB", "100"))
 
 # 舆论周期定义
 OPINION_PHASES = ["潜伏期", "爆发期", "发酵期", "消退期", "平息期"]
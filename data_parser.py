@@ -1,26 +1,318 @@
 """
 微博数据解析模块
 """
+import calendar
+import hashlib
 import json
-from datetime import datetime
-from typing import Dict, List, Any
+from array import array
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Dict, List, Any, Iterator, Optional, Tuple
 import re
 
+import numpy as np
+
+
+class JsonObjectStream:
+    """顶层JSON对象的增量解析器（按块读取文件，指定数组键的元素逐个产出）"""
+    
+    WHITESPACE = ' \t\r\n'
+    
+    # 值之后直到缓冲区末尾只剩这些字符时，可能是被块边界截断的数字（如 "1." "2e" "3e-"）
+    NUMBER_TAIL = re.compile(r'[0-9.eE+-]*\Z')
+    
+    def __init__(self, file, chunk_size: int = 1 << 20):
+        """初始化解析器"""
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self, size: int = None) -> bool:
+        """读取下一块数据并丢弃已解析部分，文件结束时返回 False"""
+        chunk = self.file.read(size or self.chunk_size)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+    
+    def _peek(self) -> str:
+        """跳过空白并返回下一个字符，文件结束时返回空串"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+    
+    def _expect(self, char: str):
+        """读取指定的分隔符"""
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"JSON格式错误: 期望 '{char}'，实际为 '{found}'")
+        self.pos += 1
+    
+    def _decode(self) -> Any:
+        """解析下一个完整的JSON值，缓冲区不足时继续读取"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # 值之后没有分隔符就到了缓冲区末尾时可能被截断（如数字），需读取更多再确认
+                if self.eof or not self.NUMBER_TAIL.match(self.buffer, end):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # 按已缓冲长度倍增读取，避免超长值被反复重解析
+            self._fill(max(self.chunk_size, len(self.buffer) - self.pos))
+    
+    def items(self, array_key: str) -> Iterator[Tuple[str, Any]]:
+        """逐个产出顶层键值对，array_key 对应的数组按元素产出 (array_key, 元素)"""
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        
+        while True:
+            key = self._decode()
+            self._expect(':')
+            
+            if key == array_key and self._peek() == '[':
+                self.pos += 1
+                if self._peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield key, self._decode()
+                        separator = self._peek()
+                        self.pos += 1
+                        if separator == ']':
+                            break
+                        if separator != ',':
+                            raise ValueError(f"JSON格式错误: 数组中出现 '{separator}'")
+            else:
+                yield key, self._decode()
+            
+            separator = self._peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"JSON格式错误: 对象中出现 '{separator}'")
+
+
+class TimeIndex:
+    """评论时间戳索引（解析一次为整数秒，存入紧凑数组，支持O(n)极值和按时间分桶统计）"""
+    
+    # 微博时间格式，首个为默认格式（如 "25-11-13 07:52"）
+    FORMATS = ("%y-%m-%d %H:%M", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%y-%m-%d")
+    
+    MAIN_COMMENT = 0
+    REPLY = 1
+    
+    HOUR = 3600
+    DAY = 86400
+    
+    def __init__(self):
+        """初始化索引"""
+        self.timestamps = array('q')
+        self.kinds = array('b')
+        self.unparsed = 0
+        self._parsed = {}
+        self._texts = {}
+    
+    def __len__(self) -> int:
+        return len(self.timestamps)
+    
+    @classmethod
+    def parse_time(cls, text: str) -> Optional[int]:
+        """将时间字符串解析为整数秒（按原始时区的墙上时间换算），无法解析时返回 None"""
+        for fmt in cls.FORMATS:
+            try:
+                return calendar.timegm(datetime.strptime(text, fmt).timetuple())
+            except ValueError:
+                continue
+        return None
+    
+    @classmethod
+    def format_time(cls, timestamp: int) -> str:
+        """将整数秒格式化为默认时间格式"""
+        return datetime.fromtimestamp(timestamp, timezone.utc).strftime(cls.FORMATS[0])
+    
+    def add(self, text: str, kind: int = MAIN_COMMENT) -> Optional[int]:
+        """添加一个时间字符串，同一字符串只解析一次"""
+        if not text:
+            return None
+        
+        if text in self._parsed:
+            timestamp = self._parsed[text]
+        else:
+            timestamp = self.parse_time(text)
+            self._parsed[text] = timestamp
+            if timestamp is not None:
+                self._texts.setdefault(timestamp, text)
+        
+        if timestamp is None:
+            self.unparsed += 1
+            return None
+        
+        self.timestamps.append(timestamp)
+        self.kinds.append(kind)
+        return timestamp
+    
+    def min(self) -> Optional[int]:
+        """最早时间戳"""
+        return min(self.timestamps) if self.timestamps else None
+    
+    def max(self) -> Optional[int]:
+        """最晚时间戳"""
+        return max(self.timestamps) if self.timestamps else None
+    
+    def original_text(self, timestamp: int) -> str:
+        """返回时间戳对应的原始时间字符串"""
+        return self._texts.get(timestamp) or self.format_time(timestamp)
+    
+    def bucket_counts(self, bucket_seconds: int, kind: int = None) -> Dict[int, int]:
+        """按固定时间间隔分桶计数，返回 {桶起始时间戳: 数量}，kind 可限定主评论或回复"""
+        timestamps = np.frombuffer(self.timestamps, dtype=np.int64) if self.timestamps else np.empty(0, np.int64)
+        if kind is not None and len(timestamps):
+            timestamps = timestamps[np.frombuffer(self.kinds, dtype=np.int8) == kind]
+        
+        buckets, counts = np.unique(timestamps // bucket_seconds, return_counts=True)
+        return {int(bucket) * bucket_seconds: int(count) for bucket, count in zip(buckets, counts)}
+    
+    def per_hour(self, kind: int = None) -> Dict[str, int]:
+        """每小时评论数，键为 "25-11-13 07:00" 格式"""
+        return {
+            self.format_time(start): count
+            for start, count in self.bucket_counts(self.HOUR, kind).items()
+        }
+    
+    def per_day(self, kind: int = None) -> Dict[str, int]:
+        """每天评论数，键为 "25-11-13" 格式"""
+        return {
+            self.format_time(start).split()[0]: count
+            for start, count in self.bucket_counts(self.DAY, kind).items()
+        }
+
 
 class WeiboDataParser:
     """微博数据解析器"""
     
-    def __init__(self, json_file_path: str):
-        """初始化解析器"""
+    def __init__(self, json_file_path: str, streaming: bool = False, columnar: bool = False):
+        """
+        初始化解析器
+        
+        streaming: 流式解析模式，评论组逐个从文件读取，内存占用与文件大小无关
+        columnar: 以 CommentStore 列存储保存解析后的评论，按下标访问时仍返回字典
+        """
         self.json_file_path = json_file_path
+        self.streaming = streaming
+        self.columnar = columnar
         self.data = None
+        self._aggregates = None
         
     def load_data(self) -> Dict:
-        """加载JSON数据"""
+        """加载JSON数据（流式模式下在单次遍历中汇总评论，self.data 只保留元数据）"""
+        if self.streaming:
+            self._aggregate()
+            return self.data
+        
         with open(self.json_file_path, 'r', encoding='utf-8') as f:
             self.data = json.load(f)
         return self.data
     
+    def _load_metadata(self) -> Dict:
+        """流式读取评论组以外的元数据"""
+        with open(self.json_file_path, 'r', encoding='utf-8') as f:
+            self.data = {
+                key: value
+                for key, value in JsonObjectStream(f).items('comment_groups')
+                if key != 'comment_groups'
+            }
+        return self.data
+    
+    def iter_comment_groups(self) -> Iterator[Dict]:
+        """逐个产出评论组"""
+        return self._iter_groups({})
+    
+    def _iter_groups(self, metadata: Dict) -> Iterator[Dict]:
+        """逐个产出评论组，流式模式下同时把读到的元数据写入 metadata"""
+        if not self.streaming:
+            if not self.data:
+                self.load_data()
+            metadata.update((k, v) for k, v in self.data.items() if k != 'comment_groups')
+            yield from self.data.get('comment_groups', [])
+            return
+        
+        with open(self.json_file_path, 'r', encoding='utf-8') as f:
+            for key, value in JsonObjectStream(f).items('comment_groups'):
+                if key == 'comment_groups':
+                    yield value
+                else:
+                    metadata[key] = value
+    
+    def _aggregate(self) -> Dict:
+        """单次遍历所有评论组，同时构建评论列表、时间范围、官方回应和计数，结果缓存在解析器上"""
+        if self._aggregates is not None:
+            return self._aggregates
+        
+        metadata = {}
+        official_author = None
+        if self.columnar:
+            from comment_store import CommentStore
+            comments = CommentStore()
+        else:
+            comments = []
+        official_responses = []
+        time_index = TimeIndex()
+        total_replies = 0
+        
+        for group in self._iter_groups(metadata):
+            if official_author is None:
+                # 流式文件中 topic_author 通常位于评论组之前；否则先单独读取元数据
+                if 'topic_author' not in metadata and self.streaming:
+                    metadata.update(self._load_metadata())
+                official_author = metadata.get('topic_author', '')
+            
+            if self.columnar:
+                comments.append_group(group)
+            else:
+                comments.append(self._parse_group(group))
+            
+            main_comment = group.get('main_comment', {})
+            replies = group.get('replies', [])
+            total_replies += len(replies)
+            
+            time_index.add(main_comment.get('time', ''), TimeIndex.MAIN_COMMENT)
+            
+            for reply in replies:
+                time_index.add(reply.get('time', ''), TimeIndex.REPLY)
+                
+                if reply.get('author') == official_author:
+                    official_responses.append({
+                        'content': reply.get('content', ''),
+                        'time': reply.get('time', ''),
+                        'responding_to': main_comment.get('author', '')
+                    })
+        
+        if self.streaming and self.data is None:
+            self.data = metadata
+        
+        self._aggregates = {
+            'comments': comments,
+            'official_responses': official_responses,
+            'time_index': time_index,
+            'total_comment_groups': len(comments),
+            'total_replies': total_replies
+        }
+        return self._aggregates
+    
     def extract_event_info(self) -> Dict:
         """提取事件基本信息"""
         if not self.data:
@@ -77,116 +369,83 @@ class WeiboDataParser:
         return info
     
     def extract_comments(self, limit: int = None) -> List[Dict]:
-        """提取评论数据"""
-        if not self.data:
-            self.load_data()
+        """提取评论数据（列存储模式下不带 limit 时返回 CommentStore）"""
+        if limit and self._aggregates is None:
+            # 只取前若干条时不必遍历全部评论组
+            return [self._parse_group(group) for group in islice(self.iter_comment_groups(), limit)]
         
-        comment_groups = self.data.get('comment_groups', [])
-        
-        if limit:
-            comment_groups = comment_groups[:limit]
-        
-        parsed_comments = []
+        comments = self._aggregate()['comments']
+        return comments[:limit] if limit else comments
+    
+    @staticmethod
+    def comment_key(comment: Dict) -> str:
+        """
+        评论/回复的稳定标识：作者、时间、内容的哈希
         
-        for group in comment_groups:
-            main_comment = group.get('main_comment', {})
-            replies = group.get('replies', [])
-            
-            comment_data = {
-                'index': group.get('index'),
-                'main_comment': {
-                    'author': main_comment.get('author', ''),
-                    'content': main_comment.get('content', ''),
-                    'time': main_comment.get('time', ''),
-                    'source': main_comment.get('source', ''),
-                    'user_id': main_comment.get('user_id', '')
-                },
-                'replies': [
-                    {
-                        'author': reply.get('author', ''),
-                        'content': reply.get('content', ''),
-                        'time': reply.get('time', ''),
-                        'source': reply.get('source', '')
-                    }
-                    for reply in replies
-                ],
-                'has_replies': group.get('has_replies', False),
-                'reply_count': len(replies)
-            }
-            
-            parsed_comments.append(comment_data)
+        评论组自带的 index 是页面内序号，会重复出现，不能用来关联分析结果
+        """
+        text = f"{comment.get('author', '')}|{comment.get('time', '')}|{comment.get('content', '')}"
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+    
+    @staticmethod
+    def _parse_group(group: Dict) -> Dict:
+        """解析单个评论组"""
+        main_comment = group.get('main_comment', {})
+        replies = group.get('replies', [])
         
-        return parsed_comments
+        return {
+            'index': group.get('index'),
+            'main_comment': {
+                'author': main_comment.get('author', ''),
+                'content': main_comment.get('content', ''),
+                'time': main_comment.get('time', ''),
+                'source': main_comment.get('source', ''),
+                'user_id': main_comment.get('user_id', '')
+            },
+            'replies': [
+                {
+                    'author': reply.get('author', ''),
+                    'content': reply.get('content', ''),
+                    'time': reply.get('time', ''),
+                    'source': reply.get('source', '')
+                }
+                for reply in replies
+            ],
+            'has_replies': group.get('has_replies', False),
+            'reply_count': len(replies)
+        }
+    
+    def get_time_index(self) -> TimeIndex:
+        """获取评论和回复的时间戳索引，可用于按小时/按天的分桶统计"""
+        return self._aggregate()['time_index']
     
     def get_time_span(self) -> Dict:
         """获取评论时间跨度"""
-        if not self.data:
-            self.load_data()
+        time_index = self.get_time_index()
+        start = time_index.min()
+        end = time_index.max()
         
-        comment_groups = self.data.get('comment_groups', [])
-        
-        times = []
-        for group in comment_groups:
-            main_comment = group.get('main_comment', {})
-            if main_comment.get('time'):
-                times.append(main_comment['time'])
-            
-            for reply in group.get('replies', []):
-                if reply.get('time'):
-                    times.append(reply['time'])
-        
-        if not times:
+        if start is None:
             return {'start': None, 'end': None, 'span_days': 0}
         
-        # 简单的时间排序（基于字符串）
-        times_sorted = sorted(times)
-        
         return {
-            'start': times_sorted[0],
-            'end': times_sorted[-1],
-            'span_days': self._calculate_day_span(times_sorted[0], times_sorted[-1])
+            'start': time_index.original_text(start),
+            'end': time_index.original_text(end),
+            'span_days': end // TimeIndex.DAY - start // TimeIndex.DAY
         }
     
-    def _calculate_day_span(self, start_time: str, end_time: str) -> int:
-        """计算时间跨度（天数）"""
-        try:
-            # 假设时间格式为 "25-11-13 07:52"
-            start = datetime.strptime(start_time.split()[0], "%y-%m-%d")
-            end = datetime.strptime(end_time.split()[0], "%y-%m-%d")
-            return (end - start).days
-        except:
-            return 0
-    
     def get_official_responses(self) -> List[Dict]:
         """提取官方回应"""
-        if not self.data:
-            self.load_data()
-        
-        official_author = self.data.get('topic_author', '')
-        official_responses = []
-        
-        comment_groups = self.data.get('comment_groups', [])
-        
-        for group in comment_groups:
-            for reply in group.get('replies', []):
-                if reply.get('author') == official_author:
-                    official_responses.append({
-                        'content': reply.get('content', ''),
-                        'time': reply.get('time', ''),
-                        'responding_to': group.get('main_comment', {}).get('author', '')
-                    })
-        
-        return official_responses
+        return self._aggregate()['official_responses']
     
     def get_statistics(self) -> Dict:
         """获取统计信息"""
+        aggregates = self._aggregate()
         if not self.data:
             self.load_data()
         
-        comment_groups = self.data.get('comment_groups', [])
-        
-        total_comments = len(comment_groups)
-        total_replies = sum(len(group.get('replies', [])) for group in comment_groups)
+        total_comments = aggregates['total_comment_groups']
+        total_replies = aggregates['total_replies']
         
         return {
             'total_comment_groups': total_comments,
@@ -0,0 +1,780 @@
+"""
+图存储后端模块 - Neo4j 与进程内内存图的统一接口
+"""
+import atexit
+import os
+import pickle
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime, timezone
+from itertools import takewhile
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def get_driver():
+    """
+    进程内共享的Neo4j驱动（自带连接池），首次调用时按配置创建
+    
+    连接池大小、连接最长存活时间、获取连接超时和事务重试时长均可配置；
+    托管事务（execute_read/execute_write）在遇到瞬时错误（死锁、连接中断、集群切主等）时
+    由驱动自动重试，直到超过 NEO4J_TX_RETRY_SECONDS。
+    """
+    global _driver
+    with _driver_lock:
+        if _driver is None:
+            from neo4j import GraphDatabase
+            _driver = GraphDatabase.driver(
+                config.NEO4J_URI,
+                auth=(config.NEO4J_USER, config.NEO4J_PASSWORD),
+                max_connection_pool_size=config.NEO4J_MAX_POOL_SIZE,
+                max_connection_lifetime=config.NEO4J_MAX_CONNECTION_LIFETIME,
+                connection_acquisition_timeout=config.NEO4J_ACQUISITION_TIMEOUT,
+                max_transaction_retry_time=config.NEO4J_TX_RETRY_SECONDS
+            )
+            atexit.register(close_driver)
+        return _driver
+
+
+def close_driver():
+    """关闭共享驱动（进程退出时自动调用）"""
+    global _driver
+    with _driver_lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+
+
+def _run(tx, query: str, params: Dict) -> List[Dict]:
+    return tx.run(query, **params).data()
+
+
+def _run_many(tx, requests: List[Tuple[str, str, Dict]]) -> List[List[Dict]]:
+    return [_run(tx, query, params) for _, query, params in requests]
+
+
+class GraphBackend:
+    """
+    图存储后端接口
+    
+    图谱构建和查询模块通过具名操作访问后端：read/write 同时传入操作名和对应的 Cypher 语句，
+    Neo4j 后端执行语句，内存后端按操作名分派到等价的实现。两者返回相同结构的记录列表。
+    """
+    
+    def read(self, op: str, query: str, **params) -> List[Dict]:
+        """执行只读操作"""
+        raise NotImplementedError
+    
+    def read_many(self, requests: List[Tuple[str, str, Dict]]) -> List[List[Dict]]:
+        """
+        在同一个只读快照中执行多个只读操作
+        
+        Args:
+            requests: (操作名, Cypher 语句, 参数) 列表
+        
+        Returns:
+            与 requests 顺序对应的记录列表
+        """
+        return [self.read(op, query, **params) for op, query, params in requests]
+    
+    def write(self, op: str, query: str, **params) -> List[Dict]:
+        """执行写操作"""
+        raise NotImplementedError
+    
+    def ensure_schema(self, schema: List[Tuple[str, str, str, str]],
+                      legacy_indexes: List[str] = ()) -> List[str]:
+        """检查并创建约束和索引，返回本次新建的名称"""
+        raise NotImplementedError
+    
+    def close(self):
+        """释放资源"""
+
+
+class Neo4jBackend(GraphBackend):
+    """Neo4j 后端（使用共享连接池，每次操作在一个托管事务中执行）"""
+    
+    def __init__(self, driver=None):
+        """
+        初始化Neo4j后端
+        
+        Args:
+            driver: 自定义驱动，默认使用进程内共享驱动（关闭后端时不关闭共享驱动）
+        """
+        self._own_driver = driver is not None
+        self.driver = driver or get_driver()
+    
+    def _session(self):
+        return self.driver.session(fetch_size=config.NEO4J_FETCH_SIZE)
+    
+    def read(self, op: str, query: str, **params) -> List[Dict]:
+        with self._session() as s:
+            return s.execute_read(_run, query, params)
+    
+    def read_many(self, requests: List[Tuple[str, str, Dict]]) -> List[List[Dict]]:
+        # 所有语句在同一个读事务中执行：一次取连接、一次 BEGIN/COMMIT，结果来自同一快照
+        with self._session() as s:
+            return s.execute_read(_run_many, requests)
+    
+    def write(self, op: str, query: str, **params) -> List[Dict]:
+        with self._session() as s:
+            return s.execute_write(_run, query, params)
+    
+    def ensure_schema(self, schema: List[Tuple[str, str, str, str]],
+                      legacy_indexes: List[str] = ()) -> List[str]:
+        from neo4j.exceptions import ClientError
+        
+        created = []
+        with self._session() as session:
+            existing = {r['name'] for r in session.run("SHOW CONSTRAINTS YIELD name")}
+            existing |= {r['name'] for r in session.run("SHOW INDEXES YIELD name")}
+            
+            # 旧版普通索引与唯一约束冲突，先删除
+            for name in legacy_indexes:
+                if name in existing:
+                    session.run(f"DROP INDEX {name} IF EXISTS").consume()
+                    print(f"已删除旧索引: {name}")
+            
+            for name, kind, label, prop in schema:
+                if name in existing or f"{name}_index" in existing:
+                    continue
+                if kind == 'unique':
+                    query = (f"CREATE CONSTRAINT {name} IF NOT EXISTS "
+                             f"FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE")
+                else:
+                    query = f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})"
+                try:
+                    session.run(query).consume()
+                    created.append(name)
+                except ClientError as e:
+                    # 已有重复数据时无法建唯一约束，退化为普通索引保证查询性能
+                    # （清理重复数据并删除该索引后，下次运行会重新尝试建约束）
+                    print(f"  ⚠ 约束 {name} 创建失败: {e.message}")
+                    if kind == 'unique':
+                        session.run(
+                            f"CREATE INDEX {name}_index IF NOT EXISTS FOR (n:{label}) ON (n.{prop})"
+                        ).consume()
+                        created.append(f"{name}_index")
+            
+            # 等待新建索引上线，避免随后的写入仍走标签扫描
+            if created:
+                session.run("CALL db.awaitIndexes(300)").consume()
+        
+        return created
+    
+    def close(self):
+        if self._own_driver:
+            self.driver.close()
+
+
+class MemoryGraphBackend(GraphBackend):
+    """
+    进程内内存图后端
+    
+    节点保存在字典中，出边/入边为邻接表，另维护标签索引和 (标签, 属性) -> 取值 -> 节点 的属性索引。
+    支持图谱构建和可视化查询用到的全部具名操作，可选在关闭时保存到本地文件供后续进程读取。
+    """
+    
+    # 保存文件的格式版本，内部结构变化时加一；加载版本不一致的文件时报错，不做迁移
+    FORMAT_VERSION = 2
+    
+    def __init__(self, path: str = None):
+        """初始化内存图，path 存在时从文件加载"""
+        self.path = path
+        self._lock = threading.RLock()
+        self._dirty = False  # 加载（或上次保存）后是否有写入，只有写入过才需要保存
+        self._reset()
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            version = state.pop('format_version', None)
+            if version != self.FORMAT_VERSION:
+                raise ValueError(f"内存图文件格式版本不一致: {path}（文件版本 {version}，"
+                                 f"当前版本 {self.FORMAT_VERSION}），请删除该文件后重新构建图谱")
+            self.__dict__.update(state)
+            print(f"已加载内存图: {path}（{len(self.nodes)} 个节点）")
+    
+    def _reset(self):
+        self.nodes = {}                      # 节点ID -> {'label': 标签, 'props': 属性}
+        self.out_edges = defaultdict(dict)   # 节点ID -> {(关系类型, 终点ID): 关系属性}
+        self.in_edges = defaultdict(dict)    # 节点ID -> {(关系类型, 起点ID): 关系属性}
+        self.labels = defaultdict(dict)      # 标签 -> {节点ID: None}（有序集合）
+        self.indexes = {}                    # (标签, 属性) -> {取值: {节点ID: None}}
+        self.sorted_keys = {}                # (标签, 属性) -> 升序取值列表（分页导出用，不保存到文件）
+        self.relationship_types = defaultdict(int)  # 关系类型 -> 数量（相当于计数存储）
+        self.next_id = 0
+    
+    def save(self, path: str = None):
+        """保存到本地文件"""
+        path = path or self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            state = {k: v for k, v in self.__dict__.items()
+                     if k not in ('path', '_lock', '_dirty', 'sorted_keys')}
+            state['format_version'] = self.FORMAT_VERSION
+            with open(path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            if path == self.path:
+                self._dirty = False
+    
+    def close(self):
+        """有写入时保存到文件；只读的使用方关闭时不保存，不会覆盖其他使用方的写入"""
+        if self.path and self._dirty:
+            self.save()
+    
+    # ---------- 基本存储操作 ----------
+    
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+    
+    def _index(self, label: str, prop: str) -> Dict:
+        """取得属性索引，不存在时扫描该标签建立"""
+        index = self.indexes.get((label, prop))
+        if index is None:
+            index = defaultdict(dict)
+            for node_id in self.labels[label]:
+                value = self.nodes[node_id]['props'].get(prop)
+                if value is not None:
+                    index[value][node_id] = None
+            self.indexes[(label, prop)] = index
+        return index
+    
+    def _sorted_keys(self, label: str, prop: str) -> List:
+        """取得属性的升序取值列表，不存在时由属性索引建立，之后随 _set 增量维护"""
+        keys = self.sorted_keys.get((label, prop))
+        if keys is None:
+            keys = sorted(self._index(label, prop))
+            self.sorted_keys[(label, prop)] = keys
+        return keys
+    
+    def _find(self, label: str, prop: str, value) -> List[str]:
+        return list(self._index(label, prop).get(value, ()))
+    
+    def _set(self, node_id: str, props: Dict):
+        """设置节点属性并维护属性索引（取值为 None 时移除属性）"""
+        node = self.nodes[node_id]
+        label = node['label']
+        for prop, value in props.items():
+            index = self.indexes.get((label, prop))
+            keys = self.sorted_keys.get((label, prop))
+            old = node['props'].get(prop)
+            if index is not None and old is not None:
+                index[old].pop(node_id, None)
+                if not index[old]:
+                    del index[old]
+                    if keys is not None:
+                        del keys[bisect_left(keys, old)]
+            if value is None:
+                node['props'].pop(prop, None)
+                continue
+            node['props'][prop] = value
+            if index is not None:
+                if keys is not None and value not in index:
+                    insort(keys, value)
+                index[value][node_id] = None
+    
+    def _create(self, label: str, props: Dict) -> str:
+        node_id = f"mem:{self.next_id}"
+        self.next_id += 1
+        self.nodes[node_id] = {'label': label, 'props': {}}
+        self.labels[label][node_id] = None
+        self._set(node_id, props)
+        return node_id
+    
+    def _merge(self, label: str, prop: str, value, on_create: Dict = None, set_props: Dict = None) -> str:
+        """等价于 MERGE (n:label {prop: value}) ON CREATE SET ... SET ..."""
+        found = self._find(label, prop, value)
+        if found:
+            node_id = found[0]
+        else:
+            node_id = self._create(label, dict(on_create or {}, **{prop: value}))
+        if set_props:
+            self._set(node_id, set_props)
+        return node_id
+    
+    def _merge_edge(self, start: str, rel_type: str, end: str, props: Dict = None):
+        """等价于 MERGE (a)-[r:rel_type]->(b) SET r += props"""
+        edge = self.out_edges[start].get((rel_type, end))
+        if edge is None:
+            edge = {}
+            self.out_edges[start][(rel_type, end)] = edge
+            self.in_edges[end][(rel_type, start)] = edge
+            self.relationship_types[rel_type] += 1
+        if props:
+            edge.update(props)
+    
+    def _delete_edge(self, start: str, rel_type: str, end: str):
+        if self.out_edges[start].pop((rel_type, end), None) is not None:
+            self.in_edges[end].pop((rel_type, start), None)
+            self.relationship_types[rel_type] -= 1
+    
+    def _delete_node(self, node_id: str):
+        """等价于 DETACH DELETE n"""
+        for rel_type, end in list(self.out_edges.get(node_id, ())):
+            self._delete_edge(node_id, rel_type, end)
+        for rel_type, start in list(self.in_edges.get(node_id, ())):
+            self._delete_edge(start, rel_type, node_id)
+        self._set(node_id, dict.fromkeys(self.nodes[node_id]['props']))
+        self.labels[self.nodes[node_id]['label']].pop(node_id, None)
+        self.out_edges.pop(node_id, None)
+        self.in_edges.pop(node_id, None)
+        del self.nodes[node_id]
+    
+    def _out(self, node_id: str, rel_type: str, label: str = None) -> List[str]:
+        return [end for (t, end) in self.out_edges.get(node_id, ())
+                if t == rel_type and (label is None or self.nodes[end]['label'] == label)]
+    
+    def _in(self, node_id: str, rel_type: str, label: str = None) -> List[str]:
+        return [start for (t, start) in self.in_edges.get(node_id, ())
+                if t == rel_type and (label is None or self.nodes[start]['label'] == label)]
+    
+    def _props(self, node_id: str) -> Dict:
+        return self.nodes[node_id]['props'] if node_id else {}
+    
+    # ---------- 接口 ----------
+    
+    def read(self, op: str, query: str, **params) -> List[Dict]:
+        return self._dispatch(op, params)
+    
+    def read_many(self, requests: List[Tuple[str, str, Dict]]) -> List[List[Dict]]:
+        # 持锁执行全部操作，期间不会穿插写入
+        with self._lock:
+            return [self._dispatch(op, params) for op, _, params in requests]
+    
+    def write(self, op: str, query: str, **params) -> List[Dict]:
+        return self._dispatch(op, params, write=True)
+    
+    def _dispatch(self, op: str, params: Dict, write: bool = False) -> List[Dict]:
+        handler = getattr(self, f"_op_{op}", None)
+        if handler is None:
+            raise NotImplementedError(f"内存图后端不支持操作: {op}")
+        # 多线程写入时串行执行，保证索引和邻接表一致
+        with self._lock:
+            if write:
+                self._dirty = True
+            return handler(**params) or []
+    
+    def ensure_schema(self, schema: List[Tuple[str, str, str, str]],
+                      legacy_indexes: List[str] = ()) -> List[str]:
+        created = []
+        for name, kind, label, prop in schema:
+            if (label, prop) not in self.indexes:
+                self._index(label, prop)
+                created.append(name)
+        return created
+    
+    # ---------- 图谱构建操作 ----------
+    
+    def _op_clear(self):
+        self._reset()
+    
+    def _op_write_event(self, event: Dict, phase: Dict):
+        now = self._now()
+        event_id = self._merge('Event', 'url', event['url'], {'created_at': now},
+                               dict(event, updated_at=now))
+        org_id = self._merge('Organization', 'name', event['author'],
+                             {'type': '官方账号', 'platform': '微博', 'created_at': now})
+        self._merge_edge(org_id, '发布', event_id)
+        phase_id = self._merge('OpinionPhase', 'key', event['url'], {'created_at': now},
+                               dict(phase, updated_at=now))
+        self._merge_edge(event_id, '处于', phase_id)
+        return [{'event_id': event_id, 'org_id': org_id}]
+    
+    def _op_existing_comments(self, url: str):
+        records = []
+        for event_id in self._find('Event', 'url', url):
+            for comment_id in self._in(event_id, '评论', 'Comment'):
+                props = self._props(comment_id)
+                records.append({
+                    'key': props.get('key'),
+                    'fingerprint': props.get('fingerprint'),
+                    'replies': [self._props(r).get('key') for r in self._in(comment_id, '回复', 'Reply')]
+                })
+        return records
+    
+    def _op_write_comments(self, rows: List[Dict], event_id: str):
+        now = self._now()
+        for row in rows:
+            user_id = self._merge_author(row['author'], row['source'], row['user_id'], now)
+            comment_id = self._merge_comment_row(row, now)
+            self._merge_edge(user_id, '发表', comment_id)
+            self._merge_edge(comment_id, '评论', event_id)
+            self._drop_stale_demands(comment_id, user_id, row['demands'])
+            for demand in row['demands']:
+                demand_id = self._merge('Demand', 'content', demand, {
+                    'status': '未知', 'frequency': '未知', 'created_at': now
+                })
+                self._merge_edge(user_id, '提出', demand_id)
+                self._merge_edge(comment_id, '包含', demand_id)
+            
+            for reply in row['replies']:
+                reply_user_id = self._merge('User', 'name', reply['author'], {
+                    'location': reply['source'], 'created_at': now
+                })
+                reply_id = self._merge('Reply', 'key', reply['key'], {
+                    'author': reply['author'], 'content': reply['content'], 'time': reply['time'],
+                    'source': reply['source'], 'created_at': now
+                })
+                self._merge_edge(reply_user_id, '发表', reply_id)
+                self._merge_edge(reply_id, '回复', comment_id)
+    
+    def _merge_author(self, name: str, location, user_id, now) -> str:
+        """评论作者：来源和ID计入评论指纹，已有用户也更新（空值不覆盖）"""
+        node_id = self._merge('User', 'name', name, {'created_at': now})
+        self._set(node_id, {k: v for k, v in {'location': location, 'user_id': user_id}.items()
+                            if v is not None})
+        return node_id
+    
+    def _merge_comment_row(self, row: Dict, now) -> str:
+        return self._merge('Comment', 'key', row['key'], {
+            'author': row['author'], 'content': row['content'], 'time': row['time'], 'created_at': now
+        }, {
+            'source': row['source'], 'sentiment': row['sentiment'], 'emotion': row['emotion'],
+            'intensity': row['intensity'], 'fingerprint': row['fingerprint'], 'updated_at': now
+        })
+    
+    def _drop_stale_demands(self, comment_id: str, user_id: Optional[str], demands: List[str]):
+        """删除评论不再包含的诉求关系，作者已没有其他评论包含该诉求时同时删除其提出关系"""
+        for demand_id in self._out(comment_id, '包含', 'Demand'):
+            if self._props(demand_id).get('content') in demands:
+                continue
+            self._delete_edge(comment_id, '包含', demand_id)
+            if user_id and not any(demand_id in self._out(c, '包含')
+                                   for c in self._out(user_id, '发表', 'Comment')):
+                self._delete_edge(user_id, '提出', demand_id)
+    
+    def _op_write_solutions(self, rows: List[Dict], event_id: str, org_id: str):
+        now = self._now()
+        # 解决方案键包含事件URL，本次结果中已不存在的方案连同其关系一起删除
+        keys = {row['key'] for row in rows}
+        for rel_type in ('针对', '建议针对'):
+            for solution_id in self._in(event_id, rel_type, 'Solution'):
+                if self._props(solution_id).get('key') not in keys:
+                    self._delete_node(solution_id)
+        for row in rows:
+            solution_id = self._merge('Solution', 'key', row['key'], {
+                'content': row['content'], 'type': row['type'], 'created_at': now
+            })
+            if row['type'] == '已采取措施':
+                self._merge_edge(org_id, '采取', solution_id)
+                self._merge_edge(solution_id, '针对', event_id)
+            elif row['type'] == '建议方案':
+                self._merge_edge(solution_id, '建议针对', event_id)
+    
+    def _op_merge_users(self, rows: List[Dict]):
+        now = self._now()
+        for row in rows:
+            if row['update']:
+                self._merge_author(row['name'], row['location'], row['user_id'], now)
+            else:
+                self._merge('User', 'name', row['name'], {
+                    'location': row['location'], 'user_id': row['user_id'], 'created_at': now
+                })
+    
+    def _op_merge_demands(self, rows: List[Dict]):
+        now = self._now()
+        for row in rows:
+            self._merge('Demand', 'content', row['content'], {
+                'status': '未知', 'frequency': '未知', 'created_at': now
+            })
+    
+    def _op_merge_comments(self, rows: List[Dict]):
+        now = self._now()
+        for row in rows:
+            comment_id = self._merge_comment_row(row, now)
+            users = self._find('User', 'name', row['author'])
+            self._drop_stale_demands(comment_id, users[0] if users else None, row['demands'])
+    
+    def _op_merge_replies(self, rows: List[Dict]):
+        now = self._now()
+        for reply in rows:
+            self._merge('Reply', 'key', reply['key'], {
+                'author': reply['author'], 'content': reply['content'], 'time': reply['time'],
+                'source': reply['source'], 'created_at': now
+            })
+    
+    def _op_merge_edges(self, rows: List[Dict], start_label: str, start_prop: str, rel_type: str,
+                        end_label: str, end_prop: str):
+        for row in rows:
+            for start in self._find(start_label, start_prop, row['start']):
+                for end in self._find(end_label, end_prop, row['end']):
+                    self._merge_edge(start, rel_type, end)
+    
+    def _op_merge_event(self, url: str, **props):
+        now = self._now()
+        node_id = self._merge('Event', 'url', url, {'created_at': now}, dict(props, updated_at=now))
+        return [{'id': node_id}]
+    
+    def _op_merge_organization(self, name: str):
+        return [{'id': self._merge('Organization', 'name', name, {
+            'type': '官方账号', 'platform': '微博', 'created_at': self._now()
+        })}]
+    
+    def _op_merge_user(self, name: str, location: str = None, user_id: str = None):
+        return [{'id': self._merge('User', 'name', name, {
+            'location': location, 'user_id': user_id, 'created_at': self._now()
+        })}]
+    
+    def _op_merge_comment(self, key: str, sentiment, emotion, intensity, **props):
+        now = self._now()
+        return [{'id': self._merge('Comment', 'key', key, dict(props, created_at=now), {
+            'sentiment': sentiment, 'emotion': emotion, 'intensity': intensity, 'updated_at': now
+        })}]
+    
+    def _op_merge_reply(self, key: str, **props):
+        return [{'id': self._merge('Reply', 'key', key, dict(props, created_at=self._now()))}]
+    
+    def _op_merge_phase(self, key: str, **props):
+        now = self._now()
+        return [{'id': self._merge('OpinionPhase', 'key', key, {'created_at': now},
+                                   dict(props, updated_at=now))}]
+    
+    def _op_merge_demand(self, content: str, status: str, frequency: str):
+        return [{'id': self._merge('Demand', 'content', content, {
+            'status': status, 'frequency': frequency, 'created_at': self._now()
+        })}]
+    
+    def _op_merge_solution(self, key: str, content: str, type: str):
+        return [{'id': self._merge('Solution', 'key', key, {
+            'content': content, 'type': type, 'created_at': self._now()
+        })}]
+    
+    def _op_merge_relationship(self, from_id: str, to_id: str, rel_type: str, **properties):
+        if from_id in self.nodes and to_id in self.nodes:
+            self._merge_edge(from_id, rel_type, to_id, properties)
+    
+    def _op_graph_stats(self):
+        return [{
+            'nodes': {label: len(ids) for label, ids in self.labels.items()},
+            'relationship_types': {t: count for t, count in self.relationship_types.items() if count},
+            'relationships': sum(self.relationship_types.values())
+        }]
+    
+    def _op_event_stats(self, url: str):
+        for event_id in self._find('Event', 'url', url):
+            comments = self._in(event_id, '评论', 'Comment')
+            replies = [r for c in comments for r in self._in(c, '回复', 'Reply')]
+            users = {u for node in comments + replies for u in self._in(node, '发表', 'User')}
+            contains = [d for c in comments for d in self._out(c, '包含')]
+            solutions = set(self._in(event_id, '针对', 'Solution')) | set(self._in(event_id, '建议针对', 'Solution'))
+            taken = [o for s in self._in(event_id, '针对', 'Solution') for o in self._in(s, '采取', 'Organization')]
+            return [{
+                'nodes': {
+                    'Event': 1,
+                    'User': len(users),
+                    'Comment': len(comments),
+                    'Reply': len(replies),
+                    'Organization': len(self._in(event_id, '发布', 'Organization')),
+                    'OpinionPhase': len(self._out(event_id, '处于', 'OpinionPhase')),
+                    'Demand': len({d for d in contains if self.nodes[d]['label'] == 'Demand'}),
+                    'Solution': len(solutions)
+                },
+                'relationship_types': {
+                    '发布': len(self._in(event_id, '发布')),
+                    '处于': len(self._out(event_id, '处于')),
+                    '发表': sum(len(self._in(node, '发表')) for node in comments + replies),
+                    '评论': len(comments),
+                    '包含': len(contains),
+                    '回复': len(replies),
+                    '采取': len(taken),
+                    '针对': len(self._in(event_id, '针对')),
+                    '建议针对': len(self._in(event_id, '建议针对'))
+                }
+            }]
+        return []
+    
+    # ---------- 可视化查询操作 ----------
+    
+    def _event_comments(self, url: str) -> List[str]:
+        """事件下的评论节点（事件不存在时为空）"""
+        return [c for event_id in self._find('Event', 'url', url)
+                for c in self._in(event_id, '评论', 'Comment')]
+    
+    def _op_latest_event(self):
+        events = [self._props(e) for e in self.labels.get('Event', ())]
+        events.sort(key=lambda e: self._order_value(e.get('updated_at')), reverse=True)
+        return [{'url': e.get('url')} for e in events[:1]]
+    
+    def _op_event_summary(self, url: str):
+        for event_id in self._find('Event', 'url', url):
+            event = self._props(event_id)
+            phases = self._out(event_id, '处于', 'OpinionPhase')
+            orgs = self._in(event_id, '发布', 'Organization')
+            return [{
+                'url': event.get('url'),
+                'content': event.get('content'),
+                'event_type': event.get('event_type'),
+                'comment_count': event.get('comment_count'),
+                'reply_count': event.get('reply_count'),
+                'phase': self._props(phases[0]).get('phase') if phases else None,
+                'organization': self._props(orgs[0]).get('name') if orgs else None
+            }]
+        return []
+    
+    def _op_sentiment_distribution(self, url: str):
+        counts = defaultdict(int)
+        for comment_id in self._event_comments(url):
+            counts[self._props(comment_id).get('sentiment')] += 1
+        records = [{'sentiment': value, 'count': count} for value, count in counts.items()]
+        return sorted(records, key=lambda r: r['count'], reverse=True)
+    
+    def _op_top_demands(self, url: str, limit: int):
+        users = defaultdict(dict)
+        for comment_id in self._event_comments(url):
+            authors = self._in(comment_id, '发表', 'User')
+            for demand_id in self._out(comment_id, '包含', 'Demand'):
+                users[demand_id].update(dict.fromkeys(authors))
+        records = []
+        for demand_id, user_ids in users.items():
+            if user_ids:
+                props = self._props(demand_id)
+                records.append({
+                    'demand': props.get('content'),
+                    'frequency': props.get('frequency'),
+                    'user_count': len(user_ids)
+                })
+        records.sort(key=lambda r: r['user_count'], reverse=True)
+        return records[:limit]
+    
+    def _op_solutions(self, url: str):
+        records = [
+            {'type': self._props(s).get('type'), 'content': self._props(s).get('content')}
+            for event_id in self._find('Event', 'url', url)
+            for rel_type in ('针对', '建议针对')
+            for s in self._in(event_id, rel_type, 'Solution')
+        ]
+        return sorted(records, key=lambda r: (r['type'] is None, r['type'] or ''))
+    
+    def _op_interaction_network(self, url: str, limit: int):
+        counts = defaultdict(int)
+        for comment_id in self._event_comments(url):
+            to_users = self._in(comment_id, '发表', 'User')
+            for reply_id in self._in(comment_id, '回复', 'Reply'):
+                for from_user in self._in(reply_id, '发表', 'User'):
+                    for to_user in to_users:
+                        counts[(from_user, to_user)] += 1
+        records = [
+            {
+                'from_user': self._props(a).get('name'),
+                'to_user': self._props(b).get('name'),
+                'interaction_count': count
+            }
+            for (a, b), count in counts.items()
+        ]
+        records.sort(key=lambda r: r['interaction_count'], reverse=True)
+        return records[:limit]
+    
+    def _op_negative_comments(self, url: str, limit: int):
+        records = []
+        for comment_id in self._event_comments(url):
+            props = self._props(comment_id)
+            if props.get('sentiment') != '负面':
+                continue
+            for user_id in self._in(comment_id, '发表', 'User'):
+                records.append({
+                    'author': self._props(user_id).get('name'),
+                    'content': props.get('content'),
+                    'emotion': props.get('emotion'),
+                    'intensity': props.get('intensity'),
+                    'time': props.get('time')
+                })
+        records.sort(key=lambda r: self._order_value(r['intensity']), reverse=True)
+        return records[:limit]
+    
+    def _export_page(self, label: str, prop: str, after, limit: int, prefix: str = '') -> List[str]:
+        """按属性值升序取出 after 之后的一页节点（可限定取值前缀），在有序取值列表上二分定位"""
+        keys = self._sorted_keys(label, prop)
+        start = 0 if after is None else bisect_right(keys, after)
+        if prefix:
+            start = max(start, bisect_left(keys, prefix))
+        values = keys[start:start + limit]
+        if prefix:
+            values = list(takewhile(lambda v: v.startswith(prefix), values))
+        index = self.indexes[(label, prop)]
+        return [(value, node_id) for value in values for node_id in index[value]]
+    
+    def _op_export_nodes(self, label: str, prop: str, after, limit: int):
+        return [{'key': value, 'props': dict(self._props(node_id))}
+                for value, node_id in self._export_page(label, prop, after, limit)]
+    
+    def _op_export_edges(self, label: str, prop: str, after, limit: int, keys: Dict):
+        records = []
+        for value, node_id in self._export_page(label, prop, after, limit):
+            edges = []
+            for (rel_type, end), props in self.out_edges.get(node_id, {}).items():
+                end_label = self.nodes[end]['label']
+                edges.append({'type': rel_type, 'end_label': end_label,
+                              'end_key': self._props(end).get(keys.get(end_label)),
+                              'props': dict(props)})
+            records.append({'key': value, 'edges': edges})
+        return records
+    
+    def _op_event_comment_threads(self, prefix: str, after: str, limit: int):
+        records = []
+        for key, comment_id in self._export_page('Comment', 'key', after, limit, prefix):
+            props = self._props(comment_id)
+            authors = self._in(comment_id, '发表', 'User')
+            replies = []
+            for reply_id in self._in(comment_id, '回复', 'Reply'):
+                reply_authors = self._in(reply_id, '发表', 'User')
+                replies.append({
+                    'key': self._props(reply_id).get('key'),
+                    'content': self._props(reply_id).get('content'),
+                    'author': self._props(reply_authors[0]).get('name') if reply_authors else None
+                })
+            records.append({
+                'key': key,
+                'content': props.get('content'),
+                'sentiment': props.get('sentiment'),
+                'intensity': props.get('intensity'),
+                'author': self._props(authors[0]).get('name') if authors else None,
+                'demands': [self._props(d).get('content') for d in self._out(comment_id, '包含', 'Demand')],
+                'replies': replies
+            })
+        return records
+    
+    @staticmethod
+    def _order_value(value):
+        """排序键：与 Cypher 一致，降序时 null 排在最前，数值按大小排序"""
+        if value is None:
+            return (2, 0)
+        if isinstance(value, (int, float)):
+            return (1, value)
+        return (0, str(value))
+
+
+_memory_backends = {}
+_memory_backends_lock = threading.Lock()
+
+
+def get_memory_backend(path: str = None) -> MemoryGraphBackend:
+    """
+    进程内按保存路径共享的内存图（与共享驱动相同，首次调用时加载）
+    
+    图谱构建器和可视化工具使用同一份图，读到的是最新写入；有写入时在进程退出前自动保存。
+    """
+    with _memory_backends_lock:
+        backend = _memory_backends.get(path)
+        if backend is None:
+            backend = MemoryGraphBackend(path)
+            _memory_backends[path] = backend
+            atexit.register(backend.close)
+        return backend
+
+
+def create_backend(kind: str = None) -> GraphBackend:
+    """按配置创建图存储后端（GRAPH_BACKEND=neo4j/memory）"""
+    kind = (kind or config.GRAPH_BACKEND).lower()
+    if kind == 'memory':
+        return get_memory_backend(config.GRAPH_MEMORY_PATH or None)
+    if kind == 'neo4j':
+        return Neo4jBackend()
+    raise ValueError(f"未知的图存储后端: {kind}")
@@ -1,350 +1,1050 @@
 """
 Neo4j 知识图谱构建模块
 """
-from neo4j import GraphDatabase
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Iterator, Optional
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import time
 import config
+from data_parser import WeiboDataParser
+from kg_csv_export import ImportCsvWriter
+from graph_backend import GraphBackend, create_backend
+from query_cache import QueryResultCache, get_query_cache
 from datetime import datetime
 
 
+# 图谱模式：(名称, 类型, 标签, 属性)
+# MERGE 所用的键建唯一约束（约束自带索引），其余查询条件建普通索引
+SCHEMA = [
+    ('user_name', 'unique', 'User', 'name'),
+    ('organization_name', 'unique', 'Organization', 'name'),
+    ('demand_content', 'unique', 'Demand', 'content'),
+    ('event_url_unique', 'unique', 'Event', 'url'),
+    ('comment_key_unique', 'unique', 'Comment', 'key'),
+    ('reply_key_unique', 'unique', 'Reply', 'key'),
+    ('phase_key_unique', 'unique', 'OpinionPhase', 'key'),
+    ('solution_key_unique', 'unique', 'Solution', 'key'),
+    ('comment_sentiment', 'index', 'Comment', 'sentiment'),
+    ('comment_intensity', 'index', 'Comment', 'intensity'),
+    ('solution_type', 'index', 'Solution', 'type'),
+]
+
+# 旧版本建立的普通索引，与同属性上的唯一约束冲突，建约束前删除
+LEGACY_INDEXES = ['event_url', 'comment_key', 'reply_key']
+
+
+# 批量写入语句：每条语句在一个显式事务中通过 UNWIND 写入一批数据
+# 所有节点按确定性键 MERGE，重复运行不会产生重复子图
+
+EVENT_QUERY = """
+MERGE (e:Event {url: $event.url})
+ON CREATE SET e.created_at = datetime()
+SET e.author = $event.author,
+    e.content = $event.content,
+    e.event_type = $event.event_type,
+    e.core_entity = $event.core_entity,
+    e.location = $event.location,
+    e.issue = $event.issue,
+    e.impact = $event.impact,
+    e.comment_count = $event.comment_count,
+    e.reply_count = $event.reply_count,
+    e.updated_at = datetime()
+MERGE (o:Organization {name: $event.author})
+ON CREATE SET o.type = '官方账号', o.platform = '微博', o.created_at = datetime()
+MERGE (o)-[:发布]->(e)
+MERGE (p:OpinionPhase {key: $event.url})
+ON CREATE SET p.created_at = datetime()
+SET p.phase = $phase.phase,
+    p.confidence = $phase.confidence,
+    p.reason = $phase.reason,
+    p.trend = $phase.trend,
+    p.updated_at = datetime()
+MERGE (e)-[:处于]->(p)
+RETURN elementId(e) as event_id, elementId(o) as org_id
+"""
+
+# 读取事件下已有评论的指纹和回复键，用于只写入新增/变化的评论
+EXISTING_COMMENTS_QUERY = """
+MATCH (e:Event {url: $url})<-[:评论]-(c:Comment)
+OPTIONAL MATCH (c)<-[:回复]-(r:Reply)
+RETURN c.key AS key, c.fingerprint AS fingerprint, collect(r.key) AS replies
+"""
+
+COMMENTS_QUERY = """
+MATCH (e:Event) WHERE elementId(e) = $event_id
+UNWIND $rows AS row
+MERGE (u:User {name: row.author})
+ON CREATE SET u.created_at = datetime()
+SET u.location = coalesce(row.source, u.location),
+    u.user_id = coalesce(row.user_id, u.user_id)
+MERGE (c:Comment {key: row.key})
+ON CREATE SET c.author = row.author,
+    c.content = row.content,
+    c.time = row.time,
+    c.created_at = datetime()
+SET c.source = row.source,
+    c.sentiment = row.sentiment,
+    c.emotion = row.emotion,
+    c.intensity = row.intensity,
+    c.fingerprint = row.fingerprint,
+    c.updated_at = datetime()
+MERGE (u)-[:发表]->(c)
+MERGE (c)-[:评论]->(e)
+WITH c, u, row
+OPTIONAL MATCH (c)-[stale:包含]->(old:Demand)
+WHERE NOT old.content IN row.demands
+DELETE stale
+WITH c, u, row, old
+OPTIONAL MATCH (u)-[claim:提出]->(old)
+WHERE NOT EXISTS { (u)-[:发表]->(:Comment)-[:包含]->(old) }
+DELETE claim
+WITH DISTINCT c, u, row
+FOREACH (demand IN row.demands |
+    MERGE (d:Demand {content: demand})
+    ON CREATE SET d.status = '未知', d.frequency = '未知', d.created_at = datetime()
+    MERGE (u)-[:提出]->(d)
+    MERGE (c)-[:包含]->(d)
+)
+FOREACH (reply IN row.replies |
+    MERGE (ru:User {name: reply.author})
+    ON CREATE SET ru.location = reply.source, ru.created_at = datetime()
+    MERGE (r:Reply {key: reply.key})
+    ON CREATE SET r.author = reply.author,
+        r.content = reply.content,
+        r.time = reply.time,
+        r.source = reply.source,
+        r.created_at = datetime()
+    MERGE (ru)-[:发表]->(r)
+    MERGE (r)-[:回复]->(c)
+)
+"""
+
+# 解决方案键包含事件URL，只属于本事件：本次结果中已不存在的方案连同其关系一起删除
+SOLUTIONS_QUERY = """
+MATCH (e:Event) WHERE elementId(e) = $event_id
+OPTIONAL MATCH (e)<-[:针对|建议针对]-(stale:Solution)
+WHERE NOT stale.key IN [row IN $rows | row.key]
+DETACH DELETE stale
+WITH DISTINCT e
+MATCH (o:Organization) WHERE elementId(o) = $org_id
+UNWIND $rows AS row
+MERGE (s:Solution {key: row.key})
+ON CREATE SET s.content = row.content, s.type = row.type, s.created_at = datetime()
+FOREACH (_ IN CASE WHEN row.type = '已采取措施' THEN [1] ELSE [] END |
+    MERGE (o)-[:采取]->(s)
+    MERGE (s)-[:针对]->(e)
+)
+FOREACH (_ IN CASE WHEN row.type = '建议方案' THEN [1] ELSE [] END |
+    MERGE (s)-[:建议针对]->(e)
+)
+"""
+
+# 多线程写入：先按分区并行写节点，再分阶段按分区并行写关系
+
+USER_NODES_QUERY = """
+UNWIND $rows AS row
+MERGE (u:User {name: row.name})
+ON CREATE SET u.location = row.location, u.user_id = row.user_id, u.created_at = datetime()
+FOREACH (_ IN CASE WHEN row.update THEN [1] ELSE [] END |
+    SET u.location = coalesce(row.location, u.location),
+        u.user_id = coalesce(row.user_id, u.user_id)
+)
+"""
+
+DEMAND_NODES_QUERY = """
+UNWIND $rows AS row
+MERGE (d:Demand {content: row.content})
+ON CREATE SET d.status = '未知', d.frequency = '未知', d.created_at = datetime()
+"""
+
+COMMENT_NODES_QUERY = """
+UNWIND $rows AS row
+MERGE (c:Comment {key: row.key})
+ON CREATE SET c.author = row.author,
+    c.content = row.content,
+    c.time = row.time,
+    c.created_at = datetime()
+SET c.source = row.source,
+    c.sentiment = row.sentiment,
+    c.emotion = row.emotion,
+    c.intensity = row.intensity,
+    c.fingerprint = row.fingerprint,
+    c.updated_at = datetime()
+WITH c, row
+OPTIONAL MATCH (c)-[stale:包含]->(old:Demand)
+WHERE NOT old.content IN row.demands
+DELETE stale
+WITH row, old
+OPTIONAL MATCH (u:User {name: row.author})-[claim:提出]->(old)
+WHERE NOT EXISTS { (u)-[:发表]->(:Comment)-[:包含]->(old) }
+DELETE claim
+"""
+
+REPLY_NODES_QUERY = """
+UNWIND $rows AS row
+MERGE (r:Reply {key: row.key})
+ON CREATE SET r.author = row.author,
+    r.content = row.content,
+    r.time = row.time,
+    r.source = row.source,
+    r.created_at = datetime()
+"""
+
+EDGES_QUERY = """
+UNWIND $rows AS row
+MATCH (a:{start_label} {{{start_prop}: row.start}})
+MATCH (b:{end_label} {{{end_prop}: row.end}})
+MERGE (a)-[:{rel_type}]->(b)
+"""
+
+# 关系分阶段写入，每个阶段内按一端分区（'start' 起点 / 'end' 终点）。创建关系会锁住两端节点：
+# - 发表按用户、回复按评论分区：另一端（评论、回复）只属于一条关系，两端都只被一个线程锁住；
+# - 提出/包含按诉求分区（诉求少而集中）：提出多个诉求的用户或评论仍可能同时被两个线程锁住，
+#   此时事务会等待锁，死锁由托管事务自动重试；
+# - 评论->事件的关系都落在同一个事件节点上，只占一个分区、串行写入，单独作为最后一个阶段，
+#   不与锁住评论的其他阶段并行。
+EDGE_STAGES = [
+    [('User', 'name', '发表', 'Comment', 'key', 'start'),
+     ('User', 'name', '发表', 'Reply', 'key', 'start')],
+    [('User', 'name', '提出', 'Demand', 'content', 'end'),
+     ('Comment', 'key', '包含', 'Demand', 'content', 'end')],
+    [('Reply', 'key', '回复', 'Comment', 'key', 'end')],
+    [('Comment', 'key', '评论', 'Event', 'url', 'end')],
+]
+
+# 图谱统计：节点标签和关系类型
+NODE_LABELS = ['Event', 'User', 'Comment', 'Reply', 'Organization', 'OpinionPhase', 'Demand', 'Solution']
+RELATIONSHIP_TYPES = ['发布', '处于', '发表', '评论', '提出', '包含', '回复', '采取', '针对', '建议针对']
+
+# 全库统计：每个子查询都只按标签/关系类型计数，由计数存储直接返回，一次往返取回全部结果
+GRAPH_STATS_QUERY = "\n".join(
+    [f"CALL {{ MATCH (n:{label}) RETURN count(n) AS n{i} }}" for i, label in enumerate(NODE_LABELS)] +
+    [f"CALL {{ MATCH ()-[r:{rel_type}]->() RETURN count(r) AS r{i} }}"
+     for i, rel_type in enumerate(RELATIONSHIP_TYPES)] +
+    ["CALL { MATCH ()-[r]->() RETURN count(r) AS relationships }",
+     "RETURN {" + ", ".join(f"`{label}`: n{i}" for i, label in enumerate(NODE_LABELS)) + "} AS nodes,",
+     "       {" + ", ".join(f"`{rel_type}`: r{i}" for i, rel_type in enumerate(RELATIONSHIP_TYPES)) +
+     "} AS relationship_types,",
+     "       relationships"]
+)
+
+# 单个事件的统计：从事件节点出发，关系数量尽量用节点度数（COUNT {} 模式计数）获得
+# 用户提出诉求的关系（提出）由多个事件共享，不计入单个事件
+EVENT_STATS_QUERY = """
+MATCH (e:Event {url: $url})
+CALL {
+    WITH e
+    MATCH (e)<-[:评论]-(c:Comment)
+    RETURN count(c) AS comments,
+           sum(COUNT { (c)<-[:发表]-() }) AS comment_posts,
+           sum(COUNT { (c)-[:包含]->() }) AS contains
+}
+CALL {
+    WITH e
+    MATCH (e)<-[:评论]-(:Comment)<-[:回复]-(r:Reply)
+    RETURN count(r) AS replies,
+           sum(COUNT { (r)<-[:发表]-() }) AS reply_posts
+}
+CALL {
+    WITH e
+    MATCH (e)<-[:评论]-(:Comment)-[:包含]->(d:Demand)
+    RETURN count(DISTINCT d) AS demands
+}
+CALL {
+    WITH e
+    CALL {
+        WITH e
+        MATCH (e)<-[:评论]-(:Comment)<-[:发表]-(u:User)
+        RETURN u
+        UNION
+        WITH e
+        MATCH (e)<-[:评论]-(:Comment)<-[:回复]-(:Reply)<-[:发表]-(u:User)
+        RETURN u
+    }
+    RETURN count(u) AS users
+}
+RETURN {
+    Event: 1,
+    User: users,
+    Comment: comments,
+    Reply: replies,
+    Organization: COUNT { (e)<-[:发布]-(:Organization) },
+    OpinionPhase: COUNT { (e)-[:处于]->(:OpinionPhase) },
+    Demand: demands,
+    Solution: COUNT { MATCH (e)<-[:针对|建议针对]-(s:Solution) RETURN DISTINCT s }
+} AS nodes, {
+    `发布`: COUNT { (e)<-[:发布]-() },
+    `处于`: COUNT { (e)-[:处于]->() },
+    `发表`: comment_posts + reply_posts,
+    `评论`: comments,
+    `包含`: contains,
+    `回复`: replies,
+    `采取`: COUNT { (e)<-[:针对]-(:Solution)<-[:采取]-(:Organization) },
+    `针对`: COUNT { (e)<-[:针对]-() },
+    `建议针对`: COUNT { (e)<-[:建议针对]-() }
+} AS relationship_types
+"""
+
+
 class KnowledgeGraphBuilder:
     """知识图谱构建器"""
     
-    def __init__(self):
-        """初始化Neo4j连接"""
-        self.driver = GraphDatabase.driver(
-            config.NEO4J_URI,
-            auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
-        )
+    def __init__(self, backend: GraphBackend = None, cache: QueryResultCache = None):
+        """
+        初始化图存储后端
+        
+        Args:
+            backend: 图存储后端，默认按 GRAPH_BACKEND 配置创建（Neo4j 或内存图）
+            cache: 写入后需要失效的查询结果缓存，默认使用进程内共享缓存
+        """
+        self.backend = backend or create_backend()
+        self.cache = cache or get_query_cache()
+        self._schema_ready = False
     
     def close(self):
         """关闭连接"""
-        self.driver.close()
+        self.backend.close()
     
     def clear_database(self):
         """清空数据库（谨慎使用）"""
-        with self.driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
-            print("数据库已清空")
+        self.backend.write('clear', "MATCH (n) DETACH DELETE n")
+        self.cache.invalidate()
+        print("数据库已清空")
+    
+    def ensure_schema(self) -> List[str]:
+        """
+        检查并创建图谱所需的约束和索引（可重复执行）
+        
+        Returns:
+            本次新建的约束/索引名称列表
+        """
+        created = self.backend.ensure_schema(SCHEMA, LEGACY_INDEXES)
+        if created:
+            print(f"已创建约束/索引: {', '.join(created)}")
+        self._schema_ready = True
+        return created
+    
+    def _write(self, op: str, query: str, **params) -> List[Dict]:
+        """单条写入（create_* 方法使用），无法确定所属事件，写入后清空全部查询缓存"""
+        result = self.backend.write(op, query, **params)
+        self.cache.invalidate()
+        return result
     
     def create_event_node(self, event_info: Dict, topic_analysis: Dict) -> str:
-        """创建事件节点"""
-        with self.driver.session() as session:
-            query = """
-            CREATE (e:Event {
-                url: $url,
-                author: $author,
-                content: $content,
-                event_type: $event_type,
-                core_entity: $core_entity,
-                location: $location,
-                issue: $issue,
-                impact: $impact,
-                comment_count: $comment_count,
-                reply_count: $reply_count,
-                created_at: datetime()
-            })
-            RETURN elementId(e) as id
-            """
-            
-            result = session.run(query,
-                url=event_info.get('url', ''),
-                author=event_info.get('author', ''),
-                content=event_info.get('topic_content', ''),
-                event_type=topic_analysis.get('event_type', ''),
-                core_entity=topic_analysis.get('core_entity', ''),
-                location=topic_analysis.get('location', ''),
-                issue=topic_analysis.get('issue', ''),
-                impact=topic_analysis.get('impact', ''),
-                comment_count=event_info.get('comment_count', 0),
-                reply_count=event_info.get('reply_count', 0)
-            )
-            
-            event_id = result.single()['id']
-            print(f"创建事件节点: {event_id}")
-            return event_id
+        """创建（或按URL更新）事件节点"""
+        query = """
+        MERGE (e:Event {url: $url})
+        ON CREATE SET e.created_at = datetime()
+        SET e.author = $author,
+            e.content = $content,
+            e.event_type = $event_type,
+            e.core_entity = $core_entity,
+            e.location = $location,
+            e.issue = $issue,
+            e.impact = $impact,
+            e.comment_count = $comment_count,
+            e.reply_count = $reply_count,
+            e.updated_at = datetime()
+        RETURN elementId(e) as id
+        """
+        
+        result = self._write('merge_event', query,
+            url=self._require_url(event_info.get('url')),
+            author=event_info.get('author', ''),
+            content=event_info.get('topic_content', ''),
+            event_type=topic_analysis.get('event_type', ''),
+            core_entity=topic_analysis.get('core_entity', ''),
+            location=topic_analysis.get('location', ''),
+            issue=topic_analysis.get('issue', ''),
+            impact=topic_analysis.get('impact', ''),
+            comment_count=event_info.get('comment_count', 0),
+            reply_count=event_info.get('reply_count', 0)
+        )
+        
+        event_id = result[0]['id']
+        print(f"创建事件节点: {event_id}")
+        return event_id
     
     def create_organization_node(self, author: str) -> str:
         """创建组织节点"""
-        with self.driver.session() as session:
-            query = """
-            MERGE (o:Organization {name: $name})
-            ON CREATE SET o.type = '官方账号', o.platform = '微博', o.created_at = datetime()
-            RETURN elementId(o) as id
-            """
-            
-            result = session.run(query, name=author)
-            org_id = result.single()['id']
-            return org_id
+        query = """
+        MERGE (o:Organization {name: $name})
+        ON CREATE SET o.type = '官方账号', o.platform = '微博', o.created_at = datetime()
+        RETURN elementId(o) as id
+        """
+        
+        result = self._write('merge_organization', query, name=author)
+        org_id = result[0]['id']
+        return org_id
     
     def create_user_node(self, author: str, location: str = None, user_id: str = None) -> str:
         """创建用户节点"""
-        with self.driver.session() as session:
-            query = """
-            MERGE (u:User {name: $name})
-            ON CREATE SET u.location = $location, u.user_id = $user_id, u.created_at = datetime()
-            RETURN elementId(u) as id
-            """
-            
-            result = session.run(query, 
-                name=author, 
-                location=location,
-                user_id=user_id
-            )
-            user_id = result.single()['id']
-            return user_id
-    
-    def create_comment_node(self, comment: Dict, sentiment: Dict = None) -> str:
-        """创建评论节点"""
-        with self.driver.session() as session:
-            main_comment = comment.get('main_comment', {})
-            
-            query = """
-            CREATE (c:Comment {
-                author: $author,
-                content: $content,
-                time: $time,
-                source: $source,
-                sentiment: $sentiment,
-                emotion: $emotion,
-                intensity: $intensity,
-                created_at: datetime()
-            })
-            RETURN elementId(c) as id
-            """
-            
-            result = session.run(query,
-                author=main_comment.get('author', ''),
-                content=main_comment.get('content', ''),
-                time=main_comment.get('time', ''),
-                source=main_comment.get('source', ''),
-                sentiment=sentiment.get('sentiment', '中性') if sentiment else '中性',
-                emotion=sentiment.get('emotion', '') if sentiment else '',
-                intensity=sentiment.get('intensity', 5) if sentiment else 5
-            )
-            
-            comment_id = result.single()['id']
-            return comment_id
-    
-    def create_reply_node(self, reply: Dict) -> str:
-        """创建回复节点"""
-        with self.driver.session() as session:
-            query = """
-            CREATE (r:Reply {
-                author: $author,
-                content: $content,
-                time: $time,
-                source: $source,
-                created_at: datetime()
-            })
-            RETURN elementId(r) as id
-            """
-            
-            result = session.run(query,
-                author=reply.get('author', ''),
-                content=reply.get('content', ''),
-                time=reply.get('time', ''),
-                source=reply.get('source', '')
-            )
-            
-            reply_id = result.single()['id']
-            return reply_id
-    
-    def create_opinion_phase_node(self, phase_info: Dict) -> str:
-        """创建舆论周期节点"""
-        with self.driver.session() as session:
-            query = """
-            CREATE (p:OpinionPhase {
-                phase: $phase,
-                confidence: $confidence,
-                reason: $reason,
-                trend: $trend,
-                created_at: datetime()
-            })
-            RETURN elementId(p) as id
-            """
-            
-            result = session.run(query,
-                phase=phase_info.get('phase', ''),
-                confidence=phase_info.get('confidence', 0),
-                reason=phase_info.get('reason', ''),
-                trend=phase_info.get('trend', '')
-            )
-            
-            phase_id = result.single()['id']
-            return phase_id
+        query = """
+        MERGE (u:User {name: $name})
+        ON CREATE SET u.location = $location, u.user_id = $user_id, u.created_at = datetime()
+        RETURN elementId(u) as id
+        """
+        
+        result = self._write('merge_user', query, 
+            name=author, 
+            location=location,
+            user_id=user_id
+        )
+        user_id = result[0]['id']
+        return user_id
+    
+    def create_comment_node(self, comment: Dict, sentiment: Dict = None, *, event_url: str) -> str:
+        """创建评论节点（按评论键合并，已存在时只更新情感属性；评论键包含事件URL，event_url 必填）"""
+        main_comment = comment.get('main_comment', {})
+        
+        query = """
+        MERGE (c:Comment {key: $key})
+        ON CREATE SET c.author = $author,
+            c.content = $content,
+            c.time = $time,
+            c.source = $source,
+            c.created_at = datetime()
+        SET c.sentiment = $sentiment,
+            c.emotion = $emotion,
+            c.intensity = $intensity,
+            c.updated_at = datetime()
+        RETURN elementId(c) as id
+        """
+        
+        result = self._write('merge_comment', query,
+            key=self._comment_key(self._require_url(event_url), main_comment),
+            author=main_comment.get('author', ''),
+            content=main_comment.get('content', ''),
+            time=main_comment.get('time', ''),
+            source=main_comment.get('source', ''),
+            sentiment=sentiment.get('sentiment', '中性') if sentiment else '中性',
+            emotion=sentiment.get('emotion', '') if sentiment else '',
+            intensity=self._to_int(sentiment.get('intensity', 5)) if sentiment else 5
+        )
+        
+        comment_id = result[0]['id']
+        return comment_id
+    
+    def create_reply_node(self, reply: Dict, comment_key: str) -> str:
+        """创建回复节点（按回复键合并，回复键以所属评论的键开头）"""
+        query = """
+        MERGE (r:Reply {key: $key})
+        ON CREATE SET r.author = $author,
+            r.content = $content,
+            r.time = $time,
+            r.source = $source,
+            r.created_at = datetime()
+        RETURN elementId(r) as id
+        """
+        
+        result = self._write('merge_reply', query,
+            key=self._reply_key(self._require_comment_key(comment_key), reply),
+            author=reply.get('author', ''),
+            content=reply.get('content', ''),
+            time=reply.get('time', ''),
+            source=reply.get('source', '')
+        )
+        
+        reply_id = result[0]['id']
+        return reply_id
+    
+    def create_opinion_phase_node(self, phase_info: Dict, event_url: str) -> str:
+        """创建（或更新）事件的舆论周期节点"""
+        query = """
+        MERGE (p:OpinionPhase {key: $key})
+        ON CREATE SET p.created_at = datetime()
+        SET p.phase = $phase,
+            p.confidence = $confidence,
+            p.reason = $reason,
+            p.trend = $trend,
+            p.updated_at = datetime()
+        RETURN elementId(p) as id
+        """
+        
+        result = self._write('merge_phase', query,
+            key=self._require_url(event_url),
+            phase=phase_info.get('phase', ''),
+            confidence=self._to_int(phase_info.get('confidence', 0)),
+            reason=phase_info.get('reason', ''),
+            trend=phase_info.get('trend', '')
+        )
+        
+        phase_id = result[0]['id']
+        return phase_id
     
     def create_demand_node(self, demand: str, status: str = "未知", frequency: str = "未知") -> str:
         """创建诉求节点"""
-        with self.driver.session() as session:
-            query = """
-            MERGE (d:Demand {content: $content})
-            ON CREATE SET d.status = $status, d.frequency = $frequency, d.created_at = datetime()
-            RETURN elementId(d) as id
+        query = """
+        MERGE (d:Demand {content: $content})
+        ON CREATE SET d.status = $status, d.frequency = $frequency, d.created_at = datetime()
+        RETURN elementId(d) as id
+        """
+        
+        result = self._write('merge_demand', query,
+            content=demand,
+            status=status,
+            frequency=frequency
+        )
+        
+        demand_id = result[0]['id']
+        return demand_id
+    
+    def create_solution_node(self, solution: str, type: str = "建议方案", *, event_url: str) -> str:
+        """创建解决方案节点（同一事件下相同类型和内容的方案只保留一个，event_url 必填）"""
+        query = """
+        MERGE (s:Solution {key: $key})
+        ON CREATE SET s.content = $content, s.type = $type, s.created_at = datetime()
+        RETURN elementId(s) as id
+        """
+        
+        result = self._write('merge_solution', query,
+            key=self._solution_key(self._require_url(event_url), solution, type),
+            content=solution,
+            type=type
+        )
+        
+        solution_id = result[0]['id']
+        return solution_id
+    
+    def create_relationship(self, from_id: str, to_id: str, rel_type: str, properties: Dict = None):
+        """创建关系（已存在同类型关系时只更新属性）"""
+        if properties:
+            prop_string = ", ".join([f"r.{k} = ${k}" for k in properties.keys()])
+            query = f"""
+            MATCH (a) WHERE elementId(a) = $from_id
+            MATCH (b) WHERE elementId(b) = $to_id
+            MERGE (a)-[r:{rel_type}]->(b)
+            SET {prop_string}
+            RETURN r
             """
-            
-            result = session.run(query,
-                content=demand,
-                status=status,
-                frequency=frequency
-            )
-            
-            demand_id = result.single()['id']
-            return demand_id
-    
-    def create_solution_node(self, solution: str, type: str = "建议方案") -> str:
-        """创建解决方案节点"""
-        with self.driver.session() as session:
-            query = """
-            CREATE (s:Solution {
-                content: $content,
-                type: $type,
-                created_at: datetime()
-            })
-            RETURN elementId(s) as id
+            self._write('merge_relationship', query,
+                               from_id=from_id, to_id=to_id, rel_type=rel_type, **properties)
+        else:
+            query = f"""
+            MATCH (a) WHERE elementId(a) = $from_id
+            MATCH (b) WHERE elementId(b) = $to_id
+            MERGE (a)-[r:{rel_type}]->(b)
+            RETURN r
             """
-            
-            result = session.run(query,
-                content=solution,
-                type=type
-            )
-            
-            solution_id = result.single()['id']
-            return solution_id
+            self._write('merge_relationship', query,
+                               from_id=from_id, to_id=to_id, rel_type=rel_type)
     
-    def create_relationship(self, from_id: str, to_id: str, rel_type: str, properties: Dict = None):
-        """创建关系"""
-        with self.driver.session() as session:
-            if properties:
-                prop_string = ", ".join([f"r.{k} = ${k}" for k in properties.keys()])
-                query = f"""
-                MATCH (a), (b)
-                WHERE elementId(a) = $from_id AND elementId(b) = $to_id
-                CREATE (a)-[r:{rel_type}]->(b)
-                SET {prop_string}
-                RETURN r
-                """
-                session.run(query, from_id=from_id, to_id=to_id, **properties)
-            else:
-                query = f"""
-                MATCH (a), (b)
-                WHERE elementId(a) = $from_id AND elementId(b) = $to_id
-                CREATE (a)-[r:{rel_type}]->(b)
-                RETURN r
-                """
-                session.run(query, from_id=from_id, to_id=to_id)
-    
-    def build_complete_graph(self, analysis_result: Dict):
-        """构建完整的知识图谱"""
+    def build_complete_graph(self, analysis_result: Dict, batch_size: int = None,
+                             max_comments: Optional[int] = None, max_replies: Optional[int] = None,
+                             workers: int = None) -> Dict:
+        """
+        构建完整的知识图谱（批量 UNWIND 写入，每批一个显式事务）
+        
+        Args:
+            analysis_result: 分析结果
+            batch_size: 每个事务写入的评论数，默认使用 KG_BATCH_SIZE
+            max_comments: 最多写入的评论数，默认使用 KG_MAX_COMMENTS，0 表示全部写入
+            max_replies: 每条评论最多写入的回复数，默认使用 KG_MAX_REPLIES，0 表示全部写入
+            workers: 并行写入的工作线程数，默认使用 KG_WRITE_WORKERS，1 表示单线程
+        
+        Returns:
+            写入统计：评论数、回复数、耗时（秒）
+        """
         print("\n开始构建知识图谱...")
+        batch_size = batch_size or config.KG_BATCH_SIZE
+        workers = workers or config.KG_WRITE_WORKERS
+        if max_comments is None:
+            max_comments = config.KG_MAX_COMMENTS
+        if max_replies is None:
+            max_replies = config.KG_MAX_REPLIES
+        if not self._schema_ready:
+            self.ensure_schema()
+        
+        event_info = analysis_result['event_info']
+        event_url = self._require_url(event_info.get('url'))
         
-        # 1. 创建事件节点
-        event_id = self.create_event_node(
-            analysis_result['event_info'],
-            analysis_result['topic_analysis']
+        # 1. 创建（或更新）事件、组织、舆论周期节点及其关系
+        ids = self.backend.write(
+            'write_event', EVENT_QUERY,
+            event=self._event_row(event_info, analysis_result['topic_analysis']),
+            phase=self._phase_row(analysis_result['opinion_phase'])
+        )[0]
+        event_id = ids['event_id']
+        
+        # 2. 只写入新增或变化的评论（以及已有评论下新增的回复）
+        existing = self._read_existing_comments(event_url)
+        total = len(analysis_result['comments'])
+        if max_comments:
+            total = min(total, max_comments)
+        print(f"写入评论节点（共 {total} 条，图谱中已有 {len(existing)} 条）...")
+        
+        # 评论参数逐条生成、按批取出，内存中只保留当前一批（多线程时为每线程一批）
+        delta = {'new': 0, 'changed': 0, 'unchanged': 0}
+        rows = self._iter_delta_rows(
+            self._iter_comment_rows(analysis_result, max_comments, max_replies),
+            existing, delta
         )
+        written = replies_written = 0
+        start = time.time()
+        pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            while True:
+                batch = list(islice(rows, batch_size * workers))
+                if not batch:
+                    break
+                if pool:
+                    self._write_comments_parallel(batch, event_url, batch_size, workers, pool)
+                else:
+                    self.backend.write('write_comments', COMMENTS_QUERY, rows=batch, event_id=event_id)
+                written += len(batch)
+                replies_written += sum(len(row['replies']) for row in batch)
+                elapsed = max(time.time() - start, 1e-6)
+                print(f"  已写入评论: {written}，回复: {replies_written}（{written / elapsed:.0f} 条评论/秒）")
+        finally:
+            if pool:
+                pool.shutdown()
+        elapsed = time.time() - start
+        print(f"  新增 {delta['new']} 条，更新 {delta['changed']} 条，未变化跳过 {delta['unchanged']} 条")
         
-        # 2. 创建组织节点
-        org_id = self.create_organization_node(
-            analysis_result['event_info']['author']
+        # 3. 创建解决方案节点
+        print("写入解决方案节点...")
+        self.backend.write(
+            'write_solutions', SOLUTIONS_QUERY,
+            rows=self._solution_rows(event_url, analysis_result.get('solutions', {})),
+            event_id=event_id,
+            org_id=ids['org_id']
         )
         
-        # 3. 创建组织发布事件关系
-        self.create_relationship(org_id, event_id, "发布")
+        # 4. 该事件的可视化查询缓存失效
+        self.cache.invalidate(event_url)
         
-        # 4. 创建舆论周期节点
-        phase_id = self.create_opinion_phase_node(
-            analysis_result['opinion_phase']
+        print("\n知识图谱构建完成！")
+        print(f"事件节点ID: {event_id}")
+        return {'comments': written, 'replies': replies_written, 'seconds': elapsed}
+    
+    def _write_comments_parallel(self, rows: List[Dict], event_url: str, batch_size: int,
+                                 workers: int, pool: ThreadPoolExecutor):
+        """
+        多线程写入一批评论：先并行写节点，再分阶段并行写关系
+        
+        每个阶段把数据按键哈希分到 workers 个分区，一个分区由一个线程（各自从连接池取会话）
+        按 batch_size 依次提交。节点阶段各线程写不同的节点；关系阶段的锁争用见 EDGE_STAGES。
+        """
+        users = {}
+        demands = {}
+        replies = []
+        edges = {spec: {} for stage in EDGE_STAGES for spec in stage}
+        user_comment, user_reply, user_demand, comment_demand, reply_comment, comment_event = (
+            spec for stage in EDGE_STAGES for spec in stage
         )
-        self.create_relationship(event_id, phase_id, "处于")
+        for row in rows:
+            # 评论作者的来源和ID计入指纹，已有用户也要更新；只回复过的用户仅在创建时设置
+            users[row['author']] = {
+                'name': row['author'], 'location': row['source'], 'user_id': row['user_id'], 'update': True
+            }
+            edges[user_comment][(row['author'], row['key'])] = None
+            edges[comment_event][(row['key'], event_url)] = None
+            for demand in row['demands']:
+                demands.setdefault(demand, {'content': demand})
+                edges[user_demand][(row['author'], demand)] = None
+                edges[comment_demand][(row['key'], demand)] = None
+            for reply in row['replies']:
+                users.setdefault(reply['author'], {
+                    'name': reply['author'], 'location': reply['source'], 'user_id': None, 'update': False
+                })
+                replies.append(reply)
+                edges[user_reply][(reply['author'], reply['key'])] = None
+                edges[reply_comment][(reply['key'], row['key'])] = None
         
-        # 5. 创建用户、评论节点和关系
-        print("创建评论节点...")
-        for i, comment_data in enumerate(analysis_result['comments'][:20]):  # 限制数量
-            main_comment = comment_data.get('main_comment', {})
-            
-            # 创建用户节点
-            user_id = self.create_user_node(
-                main_comment.get('author', ''),
-                main_comment.get('source', ''),
-                main_comment.get('user_id', '')
-            )
-            
-            # 查找对应的情感分析结果
-            sentiment = None
-            for s in analysis_result.get('sentiment_analysis', []):
-                if s.get('author') == main_comment.get('author'):
-                    sentiment = s
-                    break
-            
-            # 创建评论节点
-            comment_id = self.create_comment_node(comment_data, sentiment)
-            
-            # 创建关系
-            self.create_relationship(user_id, comment_id, "发表")
-            self.create_relationship(comment_id, event_id, "评论")
-            
-            # 处理诉求
-            if sentiment and sentiment.get('demands'):
-                for demand_text in sentiment['demands']:
-                    demand_id = self.create_demand_node(demand_text)
-                    self.create_relationship(user_id, demand_id, "提出")
-                    self.create_relationship(comment_id, demand_id, "包含")
-            
-            # 处理回复
-            for reply_data in comment_data.get('replies', [])[:5]:  # 限制回复数量
-                reply_id = self.create_reply_node(reply_data)
-                reply_user_id = self.create_user_node(
-                    reply_data.get('author', ''),
-                    reply_data.get('source', '')
-                )
-                
-                self.create_relationship(reply_user_id, reply_id, "发表")
-                self.create_relationship(reply_id, comment_id, "回复")
+        # 1. 节点：各类节点互不依赖，同一阶段内按键分区并行写入
+        jobs = [[] for _ in range(workers)]
+        self._partition(jobs, 'merge_users', USER_NODES_QUERY, list(users.values()), lambda r: r['name'])
+        self._partition(jobs, 'merge_demands', DEMAND_NODES_QUERY, list(demands.values()), lambda r: r['content'])
+        self._partition(jobs, 'merge_comments', COMMENT_NODES_QUERY, rows, lambda r: r['key'])
+        self._partition(jobs, 'merge_replies', REPLY_NODES_QUERY, replies, lambda r: r['key'])
+        self._run_partitions(jobs, batch_size, pool)
         
-        # 6. 创建解决方案节点
-        print("创建解决方案节点...")
-        solutions = analysis_result.get('solutions', {})
+        # 2. 关系：逐阶段写入，阶段内按 EDGE_STAGES 指定的一端分区
+        for stage in EDGE_STAGES:
+            jobs = [[] for _ in range(workers)]
+            for spec in stage:
+                start_label, start_prop, rel_type, end_label, end_prop, side = spec
+                query = EDGES_QUERY.format(start_label=start_label, start_prop=start_prop,
+                                           rel_type=rel_type, end_label=end_label, end_prop=end_prop)
+                edge_rows = [{'start': a, 'end': b} for a, b in edges[spec]]
+                self._partition(jobs, 'merge_edges', query, edge_rows, lambda r, side=side: r[side],
+                                start_label=start_label, start_prop=start_prop, rel_type=rel_type,
+                                end_label=end_label, end_prop=end_prop)
+            self._run_partitions(jobs, batch_size, pool)
+    
+    def benchmark_write_workers(self, analysis_result: Dict, worker_counts=(1, 2, 4, 8),
+                                batch_size: int = None) -> List[Dict]:
+        """
+        测量不同工作线程数下的图谱写入吞吐量
         
-        for action in solutions.get('taken_actions', []):
-            solution_id = self.create_solution_node(action, "已采取措施")
-            self.create_relationship(org_id, solution_id, "采取")
-            self.create_relationship(solution_id, event_id, "针对")
+        每轮开始前清空数据库后完整写入一次，仅用于测试库。
         
-        for suggestion in solutions.get('suggested_solutions', []):
-            solution_id = self.create_solution_node(suggestion, "建议方案")
-            self.create_relationship(solution_id, event_id, "建议针对")
+        Returns:
+            每轮结果：线程数、耗时、每秒写入的评论+回复数、相对单线程的加速比
+        """
+        results = []
+        for workers in worker_counts:
+            self.clear_database()
+            stats = self.build_complete_graph(analysis_result, batch_size=batch_size, workers=workers)
+            seconds = max(stats['seconds'], 1e-6)
+            results.append({
+                'workers': workers,
+                'seconds': seconds,
+                'throughput': (stats['comments'] + stats['replies']) / seconds
+            })
         
-        print("\n知识图谱构建完成！")
-        print(f"事件节点ID: {event_id}")
+        baseline = results[0]['throughput']
+        print("\n写入吞吐量对比:")
+        print(f"  {'线程数':<6}{'耗时(秒)':>10}{'条/秒':>12}{'加速比':>8}")
+        for result in results:
+            result['speedup'] = result['throughput'] / baseline
+            print(f"  {result['workers']:<6}{result['seconds']:>10.2f}"
+                  f"{result['throughput']:>12.0f}{result['speedup']:>8.2f}")
+        return results
     
-    def query_graph_stats(self) -> Dict:
-        """查询图谱统计信息"""
-        with self.driver.session() as session:
-            # 节点统计
-            node_counts = {}
-            labels = ['Event', 'User', 'Comment', 'Reply', 'Organization', 
-                     'OpinionPhase', 'Demand', 'Solution']
-            
-            for label in labels:
-                result = session.run(f"MATCH (n:{label}) RETURN count(n) as count")
-                node_counts[label] = result.single()['count']
+    @staticmethod
+    def _partition(jobs: List[List], op: str, query: str, rows: List[Dict], key, **params):
+        """按键的哈希把数据行分到各分区，同一键总落在同一分区"""
+        parts = [[] for _ in jobs]
+        for row in rows:
+            parts[hash(key(row)) % len(jobs)].append(row)
+        for job, part in zip(jobs, parts):
+            if part:
+                job.append((op, query, part, params))
+    
+    def _run_partitions(self, jobs: List[List], batch_size: int, pool: ThreadPoolExecutor):
+        """每个分区交给一个线程，分区内按批依次提交；等待全部完成后返回（出错时抛出）"""
+        def run(job):
+            for op, query, part, params in job:
+                for i in range(0, len(part), batch_size):
+                    self.backend.write(op, query, rows=part[i:i + batch_size], **params)
+        
+        futures = [pool.submit(run, job) for job in jobs if job]
+        for future in futures:
+            future.result()
+    
+    @classmethod
+    def export_import_csv(cls, analysis_results: Iterable[Dict], output_dir: str,
+                          max_comments: Optional[int] = None,
+                          max_replies: Optional[int] = None) -> Dict[str, int]:
+        """
+        将一个或多个事件的分析结果导出为 neo4j-admin database import 格式的CSV
+        
+        导出的节点、属性和关系与 build_complete_graph 写入的图谱一致，用于离线批量回填历史事件。
+        analysis_results 可以是生成器，数据逐行写入磁盘，内存中只保留当前事件。不访问图数据库。
+        
+        Args:
+            analysis_results: 分析结果（每个事件一个）
+            output_dir: 输出目录
+            max_comments: 每个事件最多导出的评论数，默认使用 KG_MAX_COMMENTS，0 表示全部
+            max_replies: 每条评论最多导出的回复数，默认使用 KG_MAX_REPLIES，0 表示全部
+        
+        Returns:
+            各标签节点数和关系数
+        """
+        if max_comments is None:
+            max_comments = config.KG_MAX_COMMENTS
+        if max_replies is None:
+            max_replies = config.KG_MAX_REPLIES
+        
+        with ImportCsvWriter(output_dir) as writer:
+            for analysis_result in analysis_results:
+                if 'comments' not in analysis_result:
+                    raise ValueError("分析结果中没有评论数据（comments），无法导出")
+                event = cls._event_row(analysis_result['event_info'], analysis_result['topic_analysis'])
+                url = event['url']
+                event_node = ('Event', url)
+                org_node = ('Organization', event['author'])
+                phase_node = ('OpinionPhase', url)
+                
+                writer.node('Event', url, event)
+                writer.node('Organization', event['author'],
+                            {'name': event['author'], 'type': '官方账号', 'platform': '微博'})
+                writer.relationship(org_node, '发布', event_node, unique=True)
+                writer.node('OpinionPhase', url,
+                            dict(cls._phase_row(analysis_result['opinion_phase']), key=url))
+                writer.relationship(event_node, '处于', phase_node, unique=True)
+                
+                comment_count = 0
+                for row in cls._iter_comment_rows(analysis_result, max_comments, max_replies):
+                    user_node = ('User', row['author'])
+                    comment_node = ('Comment', row['key'])
+                    # 与图谱构建一致：评论作者的来源和ID覆盖已有值，只回复过的用户仅在首次出现时设置
+                    writer.node('User', row['author'],
+                                {'name': row['author'], 'location': row['source'], 'user_id': row['user_id']},
+                                update=True)
+                    if not writer.node('Comment', row['key'], row):
+                        continue
+                    comment_count += 1
+                    writer.relationship(user_node, '发表', comment_node)
+                    writer.relationship(comment_node, '评论', event_node)
+                    
+                    for demand in dict.fromkeys(row['demands']):
+                        writer.node('Demand', demand,
+                                    {'content': demand, 'status': '未知', 'frequency': '未知'})
+                        writer.relationship(user_node, '提出', ('Demand', demand), unique=True)
+                        writer.relationship(comment_node, '包含', ('Demand', demand))
+                    
+                    for reply in row['replies']:
+                        writer.node('User', reply['author'],
+                                    {'name': reply['author'], 'location': reply['source']})
+                        if writer.node('Reply', reply['key'], reply):
+                            writer.relationship(('User', reply['author']), '发表', ('Reply', reply['key']))
+                            writer.relationship(('Reply', reply['key']), '回复', comment_node)
+                
+                for solution in cls._solution_rows(url, analysis_result.get('solutions', {})):
+                    if not writer.node('Solution', solution['key'], solution):
+                        continue
+                    solution_node = ('Solution', solution['key'])
+                    if solution['type'] == '已采取措施':
+                        writer.relationship(org_node, '采取', solution_node)
+                        writer.relationship(solution_node, '针对', event_node)
+                    elif solution['type'] == '建议方案':
+                        writer.relationship(solution_node, '建议针对', event_node)
+                
+                print(f"已导出事件: {url}（评论 {comment_count} 条）")
+        
+        print(f"CSV已写入: {output_dir}")
+        return writer.counts
+    
+    def _read_existing_comments(self, event_url: str) -> Dict[str, tuple]:
+        """读取事件下已有评论：评论键 -> (指纹, 回复键集合)"""
+        records = self.backend.read('existing_comments', EXISTING_COMMENTS_QUERY, url=event_url)
+        return {
+            record['key']: (record['fingerprint'], set(record['replies']))
+            for record in records
+        }
+    
+    @staticmethod
+    def _iter_delta_rows(rows: Iterator[Dict], existing: Dict[str, tuple],
+                         delta: Dict[str, int]) -> Iterator[Dict]:
+        """过滤出需要写入的评论：新评论、情感/诉求有变化或有新回复的评论，已有回复不再重复发送"""
+        for row in rows:
+            if row['key'] not in existing:
+                delta['new'] += 1
+                yield row
+                continue
             
-            # 关系统计
-            result = session.run("MATCH ()-[r]->() RETURN count(r) as count")
-            relationship_count = result.single()['count']
+            fingerprint, reply_keys = existing[row['key']]
+            row['replies'] = [reply for reply in row['replies'] if reply['key'] not in reply_keys]
+            if fingerprint == row['fingerprint'] and not row['replies']:
+                delta['unchanged'] += 1
+                continue
+            delta['changed'] += 1
+            yield row
+    
+    @staticmethod
+    def _require_url(url: Optional[str]) -> str:
+        """事件URL是事件、舆论周期、评论等节点键的组成部分，为空时所有无URL的事件会合并为一个"""
+        if not url:
+            raise ValueError("事件缺少URL（event_info.url），无法写入图谱")
+        return url
+    
+    @staticmethod
+    def _require_comment_key(comment_key: Optional[str]) -> str:
+        """回复键以评论键（含事件URL哈希前缀）开头，为空时不同事件的回复可能合并"""
+        if not comment_key:
+            raise ValueError("回复缺少所属评论的键（comment_key），无法写入图谱")
+        return comment_key
+    
+    @classmethod
+    def _event_row(cls, event_info: Dict, topic_analysis: Dict) -> Dict:
+        """事件节点属性"""
+        return {
+            'url': cls._require_url(event_info.get('url')),
+            'author': event_info.get('author', ''),
+            'content': event_info.get('topic_content', ''),
+            'event_type': topic_analysis.get('event_type', ''),
+            'core_entity': topic_analysis.get('core_entity', ''),
+            'location': topic_analysis.get('location', ''),
+            'issue': topic_analysis.get('issue', ''),
+            'impact': topic_analysis.get('impact', ''),
+            'comment_count': event_info.get('comment_count', 0),
+            'reply_count': event_info.get('reply_count', 0)
+        }
+    
+    @classmethod
+    def _phase_row(cls, phase_info: Dict) -> Dict:
+        """舆论周期节点属性"""
+        return {
+            'phase': phase_info.get('phase', ''),
+            'confidence': cls._to_int(phase_info.get('confidence', 0)),
+            'reason': phase_info.get('reason', ''),
+            'trend': phase_info.get('trend', '')
+        }
+    
+    @staticmethod
+    def comment_key_prefix(event_url: str) -> str:
+        """某个事件下所有评论键的公共前缀（可按前缀在唯一索引上范围扫描该事件的评论）"""
+        return hashlib.sha1(event_url.encode('utf-8')).hexdigest()[:16] + '#'
+    
+    @classmethod
+    def _comment_key(cls, event_url: str, main_comment: Dict) -> str:
+        """评论的确定性键：事件URL哈希 + 评论内容哈希"""
+        return cls.comment_key_prefix(event_url) + WeiboDataParser.comment_key(main_comment)
+    
+    @staticmethod
+    def _reply_key(comment_key: str, reply: Dict) -> str:
+        """回复的确定性键：所属评论键 + 回复内容哈希（新回复插入不影响已有回复的键）"""
+        return f"{comment_key}#{WeiboDataParser.comment_key(reply)}"
+    
+    @staticmethod
+    def _solution_key(event_url: str, content: str, type: str) -> str:
+        """解决方案的确定性键：事件URL + 类型 + 内容的哈希"""
+        return hashlib.sha1(f"{event_url}|{type}|{content}".encode('utf-8')).hexdigest()[:16]
+    
+    @staticmethod
+    def _fingerprint(row: Dict) -> str:
+        """评论可变属性（情感、诉求、用户信息）的指纹，用于判断重跑时是否需要更新"""
+        values = [row['sentiment'], row['emotion'], row['intensity'], row['demands'],
+                  row['source'], row['user_id']]
+        return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+    
+    @staticmethod
+    def _sentiment_lookup(sentiment_analysis: List[Dict]):
+        """
+        构建情感结果的查找函数（按评论键常数时间关联）
+        
+        旧版分析结果没有 key 字段，此时退回按作者匹配（同一作者取第一条）
+        """
+        by_key = {}
+        by_author = {}
+        for s in sentiment_analysis:
+            if s.get('key'):
+                by_key.setdefault(s['key'], s)
+            else:
+                by_author.setdefault(s.get('author'), s)
+        
+        def lookup(main_comment: Dict) -> Optional[Dict]:
+            sentiment = by_key.get(WeiboDataParser.comment_key(main_comment)) if by_key else None
+            if sentiment is None and by_author:
+                sentiment = by_author.get(main_comment.get('author'))
+            return sentiment
+        
+        return lookup
+    
+    @staticmethod
+    def _to_int(value: Any) -> Optional[int]:
+        """LLM返回的数值（强度、置信度）统一为整数，无法转换时为 None（与CSV导入的 :int 列一致）"""
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+    
+    @staticmethod
+    def _normalize_demands(demands: Any) -> List[str]:
+        """诉求统一为非空字符串列表"""
+        if isinstance(demands, str):
+            demands = [demands]
+        if not isinstance(demands, list):
+            return []
+        return [str(demand) for demand in demands if demand]
+    
+    @classmethod
+    def _iter_comment_rows(cls, analysis_result: Dict, max_comments: int = 0,
+                           max_replies: int = 0) -> Iterator[Dict]:
+        """逐条生成评论写入参数（含诉求和回复），max_comments/max_replies 为 0 时不限制"""
+        event_url = analysis_result['event_info'].get('url', '')
+        comments = islice(analysis_result['comments'], max_comments or None)
+        find_sentiment = cls._sentiment_lookup(analysis_result.get('sentiment_analysis', []))
+        
+        for comment_data in comments:
+            main_comment = comment_data.get('main_comment', {})
+            sentiment = find_sentiment(main_comment)
+            comment_key = cls._comment_key(event_url, main_comment)
             
-            return {
-                'nodes': node_counts,
-                'relationships': relationship_count,
-                'total_nodes': sum(node_counts.values())
+            row = {
+                'key': comment_key,
+                'author': main_comment.get('author', ''),
+                'content': main_comment.get('content', ''),
+                'time': main_comment.get('time', ''),
+                'source': main_comment.get('source', ''),
+                'user_id': main_comment.get('user_id', ''),
+                'sentiment': sentiment.get('sentiment', '中性') if sentiment else '中性',
+                'emotion': sentiment.get('emotion', '') if sentiment else '',
+                'intensity': cls._to_int(sentiment.get('intensity', 5)) if sentiment else 5,
+                'demands': cls._normalize_demands(sentiment.get('demands')) if sentiment else [],
+                'replies': [
+                    {
+                        'key': cls._reply_key(comment_key, reply),
+                        'author': reply.get('author', ''),
+                        'content': reply.get('content', ''),
+                        'time': reply.get('time', ''),
+                        'source': reply.get('source', '')
+                    }
+                    for reply in islice(comment_data.get('replies', []), max_replies or None)
+                ]
             }
+            row['fingerprint'] = cls._fingerprint(row)
+            yield row
+    
+    @classmethod
+    def _solution_rows(cls, event_url: str, solutions: Dict) -> List[Dict]:
+        """解决方案写入参数"""
+        rows = [
+            {'content': action, 'type': '已采取措施'}
+            for action in solutions.get('taken_actions', [])
+        ]
+        rows += [
+            {'content': suggestion, 'type': '建议方案'}
+            for suggestion in solutions.get('suggested_solutions', [])
+        ]
+        for row in rows:
+            row['key'] = cls._solution_key(event_url, str(row['content']), row['type'])
+        return rows
+    
+    def query_graph_stats(self, event_url: str = None) -> Dict:
+        """
+        查询图谱统计信息（一次往返）
+        
+        Args:
+            event_url: 指定时只统计该事件的子图，否则统计全库
+        
+        Returns:
+            各标签节点数、各类型关系数、关系总数和节点总数
+        """
+        if event_url:
+            result = self.backend.read('event_stats', EVENT_STATS_QUERY, url=event_url)
+            if not result:
+                return {'nodes': {label: 0 for label in NODE_LABELS}, 'relationship_types': {},
+                        'relationships': 0, 'total_nodes': 0}
+            record = result[0]
+            relationships = sum(record['relationship_types'].values())
+        else:
+            record = self.backend.read('graph_stats', GRAPH_STATS_QUERY)[0]
+            relationships = record['relationships']
+        
+        node_counts = {label: record['nodes'].get(label, 0) for label in NODE_LABELS}
+        return {
+            'nodes': node_counts,
+            'relationship_types': record['relationship_types'],
+            'relationships': relationships,
+            'total_nodes': sum(node_counts.values())
+        }
 
 
 if __name__ == "__main__":
+    import sys
+    
     # 测试代码
     kg = KnowledgeGraphBuilder()
     
+    # 写入吞吐量基准：python kg_builder.py --benchmark <分析结果.json> [线程数 ...]
+    if len(sys.argv) > 2 and sys.argv[1] == '--benchmark':
+        confirm = input("基准测试会反复清空数据库，确认继续吗？(yes/no): ")
+        if confirm.lower() == 'yes':
+            with open(sys.argv[2], 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            counts = tuple(int(n) for n in sys.argv[3:]) or (1, 2, 4, 8)
+            kg.benchmark_write_workers(result, counts)
+        kg.close()
+        sys.exit(0)
+    
+    print("检查图谱约束与索引...")
+    kg.ensure_schema()
+    
     print("查询图谱统计...")
     stats = kg.query_graph_stats()
     print(f"\n节点统计:")
@@ -0,0 +1,226 @@
+"""
+知识图谱离线导出模块 - 生成 neo4j-admin database import 可直接导入的CSV文件
+"""
+import csv
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+
+# 各标签的节点属性：(CSV表头, 属性名)，表头类型后缀遵循 neo4j-admin 导入格式
+NODE_FIELDS = {
+    'Event': [
+        ('url', 'url'), ('author', 'author'), ('content', 'content'),
+        ('event_type', 'event_type'), ('core_entity', 'core_entity'),
+        ('location', 'location'), ('issue', 'issue'), ('impact', 'impact'),
+        ('comment_count:long', 'comment_count'), ('reply_count:long', 'reply_count'),
+        ('created_at:datetime', 'created_at'), ('updated_at:datetime', 'updated_at'),
+    ],
+    'Organization': [
+        ('name', 'name'), ('type', 'type'), ('platform', 'platform'),
+        ('created_at:datetime', 'created_at'),
+    ],
+    'OpinionPhase': [
+        ('key', 'key'), ('phase', 'phase'), ('confidence:int', 'confidence'),
+        ('reason', 'reason'), ('trend', 'trend'),
+        ('created_at:datetime', 'created_at'), ('updated_at:datetime', 'updated_at'),
+    ],
+    'User': [
+        ('name', 'name'), ('location', 'location'), ('user_id', 'user_id'),
+        ('created_at:datetime', 'created_at'),
+    ],
+    'Comment': [
+        ('key', 'key'), ('author', 'author'), ('content', 'content'), ('time', 'time'),
+        ('source', 'source'), ('sentiment', 'sentiment'), ('emotion', 'emotion'),
+        ('intensity:int', 'intensity'), ('fingerprint', 'fingerprint'),
+        ('created_at:datetime', 'created_at'), ('updated_at:datetime', 'updated_at'),
+    ],
+    'Reply': [
+        ('key', 'key'), ('author', 'author'), ('content', 'content'), ('time', 'time'),
+        ('source', 'source'), ('created_at:datetime', 'created_at'),
+    ],
+    'Demand': [
+        ('content', 'content'), ('status', 'status'), ('frequency', 'frequency'),
+        ('created_at:datetime', 'created_at'),
+    ],
+    'Solution': [
+        ('key', 'key'), ('content', 'content'), ('type', 'type'),
+        ('created_at:datetime', 'created_at'),
+    ],
+}
+
+RELATIONSHIP_HEADER = [':START_ID', ':END_ID', ':TYPE']
+
+# 属性会被后续数据更新的标签（对应图谱构建中 MERGE 之后的 SET），在内存中合并、关闭时写出
+MERGED_LABELS = {'User'}
+
+
+class ImportCsvWriter:
+    """
+    neo4j-admin 导入文件写入器
+    
+    每个标签一个节点文件、所有关系一个文件，表头单独写入 *_header.csv。
+    节点ID为“标签:键”，按键去重（对应图谱构建中的 MERGE），数据逐行写入磁盘；
+    MERGED_LABELS 中的节点（用户）按键合并属性，关闭时统一写出。
+    """
+    
+    def __init__(self, output_dir: str):
+        """创建输出目录并打开各数据文件"""
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        
+        self._files = {}
+        self._writers = {}
+        for label in NODE_FIELDS:
+            self._open(label, f"{label.lower()}.csv")
+        self._open('relationships', 'relationships.csv')
+        
+        self._seen = {label: set() for label in NODE_FIELDS}
+        self._merged = {label: {} for label in MERGED_LABELS}
+        self._seen_relationships = set()
+        self.counts = {label: 0 for label in NODE_FIELDS}
+        self.counts['relationships'] = 0
+    
+    def _open(self, name: str, file_name: str):
+        f = open(os.path.join(self.output_dir, file_name), 'w', encoding='utf-8', newline='')
+        self._files[name] = f
+        self._writers[name] = csv.writer(f)
+    
+    @staticmethod
+    def node_id(label: str, key: str) -> str:
+        """全局唯一的导入ID"""
+        return f"{label}:{key}"
+    
+    def node(self, label: str, key: str, properties: Dict, update: bool = False) -> bool:
+        """
+        写入一个节点，同一标签下键已写过时跳过
+        
+        Args:
+            update: 键已存在时用非空属性覆盖已有属性（仅 MERGED_LABELS，对应 SET coalesce(...)）
+        
+        Returns:
+            是否为新节点
+        """
+        if label in self._merged:
+            nodes = self._merged[label]
+            if key in nodes:
+                if update:
+                    nodes[key].update((k, v) for k, v in properties.items() if v is not None)
+                return False
+            nodes[key] = dict(properties)
+            self.counts[label] += 1
+            return True
+        
+        seen = self._seen[label]
+        if key in seen:
+            return False
+        seen.add(key)
+        self._write_node(label, key, properties)
+        self.counts[label] += 1
+        return True
+    
+    def _write_node(self, label: str, key: str, properties: Dict):
+        properties = dict(properties, created_at=self.created_at, updated_at=self.created_at)
+        row = [self.node_id(label, key)]
+        for header, name in NODE_FIELDS[label]:
+            row.append(self._format(header, properties.get(name)))
+        self._writers[label].writerow(row)
+    
+    def relationship(self, start: Tuple[str, str], rel_type: str, end: Tuple[str, str],
+                     unique: bool = False):
+        """
+        写入一条关系，start/end 为 (标签, 键)
+        
+        unique=True 时同一起止点和类型只写一次（用于可能重复出现的关系，如用户提出同一诉求）
+        """
+        start_id = self.node_id(*start)
+        end_id = self.node_id(*end)
+        if unique:
+            triple = (start_id, rel_type, end_id)
+            if triple in self._seen_relationships:
+                return
+            self._seen_relationships.add(triple)
+        self._writers['relationships'].writerow([start_id, end_id, rel_type])
+        self.counts['relationships'] += 1
+    
+    @staticmethod
+    def _format(header: str, value):
+        """按列类型格式化取值，无法转换的数值留空（导入时不设置该属性）"""
+        if value is None:
+            return ''
+        if header.endswith(':int') or header.endswith(':long'):
+            try:
+                return int(float(value))
+            except (TypeError, ValueError):
+                return ''
+        return value
+    
+    def close(self) -> Dict[str, int]:
+        """写入合并后的节点、表头和导入命令，关闭文件，返回各类数据的写入数量"""
+        for label, nodes in self._merged.items():
+            for key, properties in nodes.items():
+                self._write_node(label, key, properties)
+            nodes.clear()
+        for f in self._files.values():
+            f.close()
+        
+        for label, fields in NODE_FIELDS.items():
+            self._write_header(f"{label.lower()}_header.csv", [':ID'] + [h for h, _ in fields])
+        self._write_header('relationships_header.csv', RELATIONSHIP_HEADER)
+        
+        with open(os.path.join(self.output_dir, 'import_command.txt'), 'w', encoding='utf-8') as f:
+            f.write(self.import_command() + '\n')
+        
+        return dict(self.counts)
+    
+    def _write_header(self, file_name: str, header: List[str]):
+        with open(os.path.join(self.output_dir, file_name), 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerow(header)
+    
+    def import_command(self, database: str = 'neo4j') -> str:
+        """生成对应的 neo4j-admin 导入命令（在输出目录下执行）"""
+        args = ["neo4j-admin database import full",
+                "--overwrite-destination",
+                "--multiline-fields=true"]
+        for label in NODE_FIELDS:
+            name = label.lower()
+            args.append(f"--nodes={label}={name}_header.csv,{name}.csv")
+        args.append("--relationships=relationships_header.csv,relationships.csv")
+        args.append(database)
+        return " \\\n  ".join(args)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    from kg_builder import KnowledgeGraphBuilder
+    
+    if len(sys.argv) < 3:
+        print("用法: python kg_csv_export.py <输出目录> <分析结果.json> [更多分析结果.json ...]")
+        sys.exit(1)
+    
+    def load_results(paths):
+        """逐个加载分析结果文件，内存中只保留当前事件"""
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                print(f"读取: {path}")
+                result = json.load(f)
+            if 'comments' not in result:
+                print(f"  ⚠ 跳过: {path} 中没有评论数据（comments），请用当前版本重新运行分析流程生成结果文件")
+                continue
+            yield result
+    
+    # 导出只读取分析结果文件，不连接图数据库
+    counts = KnowledgeGraphBuilder.export_import_csv(load_results(sys.argv[2:]), sys.argv[1])
+    
+    print("\n导出统计:")
+    for name, count in counts.items():
+        print(f"  {name}: {count}")
+    print(f"\n导入命令见: {os.path.join(sys.argv[1], 'import_command.txt')}")
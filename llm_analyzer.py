@@ -1,10 +1,58 @@
 """
 LLM分析模块 - 使用通义千问API
 """
+import openai
 from openai import OpenAI
-from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Optional
 import json
+import random
+import threading
+import time
 import config
+from rate_limiter import TokenBucket, CircuitBreaker
+from llm_cache import LLMResponseCache
+from comment_dedup import CommentDeduplicator
+from sentiment_lexicon import LexiconSentimentClassifier
+from data_parser import WeiboDataParser
+
+
+SYSTEM_PROMPT = "你是一个专业的舆情分析助手，擅长分析社交媒体内容。"
+
+# 打包模式下每条评论结果的估算输出token数
+PACKED_OUTPUT_TOKENS_PER_ITEM = 80
+
+# 限流时为单次响应预留的估算输出token数
+RESPONSE_TOKENS_ESTIMATE = 300
+
+# 可重试的错误：限流、超时、连接失败、服务端5xx
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class LLMCallError(Exception):
+    """LLM调用在重试后仍然失败"""
+
+
+def _is_json(content: str) -> bool:
+    """响应是否为合法JSON（所有分析提示词都要求只返回JSON）"""
+    try:
+        json.loads(content)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_json_array(content: str) -> bool:
+    """响应是否为JSON数组（打包分析的响应格式）"""
+    try:
+        return isinstance(json.loads(content), list)
+    except ValueError:
+        return False
 
 
 class LLMAnalyzer:
@@ -14,27 +62,133 @@ class LLMAnalyzer:
         """初始化LLM客户端"""
         config.check_config()
         
+        # 重试由 _call_llm 统一处理，关闭客户端自带的重试
         self.client = OpenAI(
             api_key=config.DASHSCOPE_API_KEY,
-            base_url=config.DASHSCOPE_BASE_URL
+            base_url=config.DASHSCOPE_BASE_URL,
+            timeout=config.LLM_TIMEOUT,
+            max_retries=0
         )
         self.model = config.MODEL_NAME
+        
+        # 所有工作线程共享的限流器和熔断器
+        self.request_limiter = TokenBucket(config.LLM_RPM)
+        self.token_limiter = TokenBucket(config.LLM_TPM)
+        self.breaker = CircuitBreaker(config.LLM_CIRCUIT_FAILURES, config.LLM_CIRCUIT_COOLDOWN)
+        self.max_retries = config.LLM_MAX_RETRIES
+        self.call_stats = {'requests': 0, 'retries': 0, 'failures': 0}
+        self._stats_lock = threading.Lock()
+        self.max_concurrency = max(1, config.LLM_MAX_CONCURRENCY)
+        self.pack_size = max(1, config.SENTIMENT_PACK_SIZE)
+        self.pack_token_budget = config.SENTIMENT_PACK_TOKEN_BUDGET
+        self.batch_stats = {}
+        
+        self.deduplicator = None
+        if config.COMMENT_DEDUP_ENABLED:
+            self.deduplicator = CommentDeduplicator(similarity=config.COMMENT_DEDUP_SIMILARITY)
+        
+        self.local_classifier = None
+        self.local_threshold = config.SENTIMENT_LOCAL_THRESHOLD
+        if config.SENTIMENT_LOCAL_ENABLED:
+            self.local_classifier = LexiconSentimentClassifier(config.SENTIMENT_LEXICON_PATH)
+        
+        self.cache = None
+        if config.LLM_CACHE_ENABLED:
+            self.cache = LLMResponseCache(config.LLM_CACHE_PATH, config.LLM_CACHE_MAX_MB)
+    
+    def close(self):
+        """关闭资源"""
+        if self.cache:
+            self.cache.close()
     
-    def _call_llm(self, prompt: str, temperature: float = 0.7) -> str:
-        """调用LLM API"""
+    def _call_llm(self, prompt: str, temperature: float = 0.7,
+                  system_prompt: str = SYSTEM_PROMPT, raise_on_error: bool = False,
+                  validate: Callable[[str], bool] = _is_json) -> str:
+        """
+        调用LLM API（优先读取本地缓存，限流并对可重试错误指数退避）
+        
+        只有通过 validate 校验（默认为合法JSON）的响应才写入缓存，格式错误的响应下次运行会重新请求；
+        缓存中未通过校验的旧条目同样不使用。
+        """
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.make_key(self.model, system_prompt, prompt, temperature)
+            cached = self.cache.get(cache_key)
+            if cached is not None and validate(cached):
+                return cached
+        
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的舆情分析助手，擅长分析社交媒体内容。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature
-            )
-            return response.choices[0].message.content
-        except Exception as e:
+            content = self._request_with_retry(prompt, temperature, system_prompt)
+        except LLMCallError as e:
+            if raise_on_error:
+                raise
             print(f"LLM调用错误: {e}")
             return ""
+        
+        if self.cache and content and validate(content):
+            self.cache.set(cache_key, content)
+        
+        return content
+    
+    def _request_with_retry(self, prompt: str, temperature: float, system_prompt: str) -> str:
+        """发送请求，失败时按带抖动的指数退避重试"""
+        estimated_tokens = self._estimate_tokens(system_prompt + prompt) + RESPONSE_TOKENS_ESTIMATE
+        
+        for attempt in range(self.max_retries + 1):
+            self.breaker.before_call()
+            self.request_limiter.acquire()
+            self.token_limiter.acquire(estimated_tokens)
+            self._count('requests')
+            
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=temperature
+                )
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    self._count('failures')
+                    raise LLMCallError(f"重试 {self.max_retries} 次后仍失败: {e}") from e
+                self._count('retries')
+                time.sleep(self._backoff_delay(attempt, e))
+                continue
+            except Exception as e:
+                # 非重试类错误（如参数错误）说明服务可达，不计入熔断
+                self.breaker.record_success()
+                self._count('failures')
+                raise LLMCallError(str(e)) from e
+            
+            self.breaker.record_success()
+            
+            usage = getattr(response, 'usage', None)
+            if usage and getattr(usage, 'total_tokens', None):
+                self.token_limiter.adjust(usage.total_tokens - estimated_tokens)
+            
+            return response.choices[0].message.content
+    
+    @staticmethod
+    def _backoff_delay(attempt: int, error: Exception) -> float:
+        """计算退避时间（full jitter），服务端给出 Retry-After 时不短于该值"""
+        delay = random.uniform(0, min(config.LLM_BACKOFF_MAX, config.LLM_BACKOFF_BASE * 2 ** attempt))
+        
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            delay = max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+        
+        return delay
+    
+    def _count(self, key: str):
+        """线程安全地累加调用统计"""
+        with self._stats_lock:
+            self.call_stats[key] += 1
     
     def analyze_topic(self, topic: str, author: str) -> Dict:
         """分析主题内容"""
@@ -64,12 +218,16 @@ class LLMAnalyzer:
             # 如果解析失败，返回原始文本
             return {"raw_response": result}
     
-    def analyze_sentiment_batch(self, comments: List[Dict]) -> List[Dict]:
-        """批量分析评论情感"""
-        results = []
+    def analyze_sentiment_batch(self, comments: List[Dict], max_concurrency: int = None,
+                                pack_size: int = None, local_threshold: float = None) -> List[Dict]:
+        """
+        批量分析评论情感（并发请求，结果按输入顺序返回）
+        
+        每条结果带 key（WeiboDataParser.comment_key），图谱构建时据此与评论一一对应
+        """
+        items = []
         
-        # for comment in comments[:20]:  # 限制处理数量以节省API调用
-        for comment in comments:  # 去除限制处理数量
+        for comment in comments:
             main_comment = comment.get('main_comment', {})
             content = main_comment.get('content', '')
             author = main_comment.get('author', '')
@@ -77,9 +235,46 @@ class LLMAnalyzer:
             if not content:
                 continue
             
-            sentiment = self.analyze_sentiment(content)
-            
+            items.append((WeiboDataParser.comment_key(main_comment), author, content))
+        
+        contents = [content for _, _, content in items]
+        
+        # 重复评论只分析代表评论，结果分发给同组的每条评论
+        if self.deduplicator:
+            groups = self.deduplicator.group(contents)
+        else:
+            groups = list(range(len(contents)))
+        
+        representatives = sorted(set(groups))
+        rep_contents = [contents[i] for i in representatives]
+        
+        # 本地词典先判定，只有低置信度的评论交给LLM
+        if self.local_classifier:
+            threshold = self.local_threshold if local_threshold is None else local_threshold
+            rep_sentiments = self.local_classifier.classify(rep_contents, threshold)
+        else:
+            rep_sentiments = [None] * len(rep_contents)
+        
+        pending = [i for i, sentiment in enumerate(rep_sentiments) if sentiment is None]
+        llm_sentiments = self._analyze_contents(
+            [rep_contents[i] for i in pending],
+            max_concurrency,
+            pack_size or self.pack_size
+        )
+        for i, sentiment in zip(pending, llm_sentiments):
+            rep_sentiments[i] = sentiment
+        
+        by_rep = dict(zip(representatives, rep_sentiments))
+        sentiments = [by_rep[rep] for rep in groups]
+        
+        self.batch_stats['comments'] = len(contents)
+        self.batch_stats['dedup_saved'] = len(contents) - len(representatives)
+        self.batch_stats['local_classified'] = len(representatives) - len(pending)
+        
+        results = []
+        for (key, author, content), sentiment in zip(items, sentiments):
             results.append({
+                'key': key,
                 'author': author,
                 'content': content,
                 'sentiment': sentiment['sentiment'],
@@ -89,6 +284,85 @@ class LLMAnalyzer:
         
         return results
     
+    def _analyze_contents(self, contents: List[str], max_concurrency: int = None,
+                          pack_size: int = 1) -> List[Dict]:
+        """分析评论文本列表，按需打包为多条评论一次请求"""
+        self.batch_stats = {
+            'analyzed': len(contents),
+            'packed_requests': 0,
+            'single_requests': 0
+        }
+        
+        if pack_size <= 1:
+            self.batch_stats['single_requests'] = len(contents)
+            return self._run_concurrently(self.analyze_sentiment, contents, max_concurrency)
+        
+        packs = self._split_packs(contents, pack_size)
+        packed_results = self._run_concurrently(
+            lambda pack: self.analyze_sentiment_packed([contents[i] for i in pack]),
+            packs,
+            max_concurrency
+        )
+        
+        results = [None] * len(contents)
+        for pack, pack_result in zip(packs, packed_results):
+            for i, sentiment in zip(pack, pack_result):
+                results[i] = sentiment
+        
+        # 只对解析失败的评论逐条重试
+        failed = [i for i, sentiment in enumerate(results) if sentiment is None]
+        retried = self._run_concurrently(
+            self.analyze_sentiment,
+            [contents[i] for i in failed],
+            max_concurrency
+        )
+        for i, sentiment in zip(failed, retried):
+            results[i] = sentiment
+        
+        self.batch_stats['packed_requests'] = sum(1 for pack in packs if len(pack) > 1)
+        self.batch_stats['single_requests'] = len(failed) + sum(1 for pack in packs if len(pack) == 1)
+        
+        return results
+    
+    def _split_packs(self, contents: List[str], pack_size: int) -> List[List[int]]:
+        """按条数上限和token预算切分评论，返回每个分包的下标列表"""
+        packs = []
+        current = []
+        current_tokens = 0
+        
+        for i, content in enumerate(contents):
+            tokens = self._estimate_tokens(content) + PACKED_OUTPUT_TOKENS_PER_ITEM
+            
+            if current and (len(current) >= pack_size or
+                            current_tokens + tokens > self.pack_token_budget):
+                packs.append(current)
+                current = []
+                current_tokens = 0
+            
+            current.append(i)
+            current_tokens += tokens
+        
+        if current:
+            packs.append(current)
+        
+        return packs
+    
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """粗略估算token数（中文约每字一个token，其他字符约4个一个token）"""
+        cjk = sum(1 for ch in text if '\u4e00' <= ch <= '\u9fff')
+        return cjk + (len(text) - cjk) // 4 + 1
+    
+    def _run_concurrently(self, func, args: List, max_concurrency: int = None) -> List:
+        """使用有界线程池并发执行，结果顺序与输入一致"""
+        workers = min(max_concurrency or self.max_concurrency, len(args))
+        
+        if workers <= 1:
+            return [func(arg) for arg in args]
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, args))
+    
     def analyze_sentiment(self, comment: str) -> Dict:
         """分析单条评论的情感"""
         prompt = f"""
@@ -106,7 +380,18 @@ class LLMAnalyzer:
 }}
 """
         
-        result = self._call_llm(prompt, temperature=0.3)
+        try:
+            result = self._call_llm(prompt, temperature=0.3, raise_on_error=True)
+        except LLMCallError as e:
+            # 调用失败单独标记，避免被计为中性
+            return {
+                "sentiment": "未知",
+                "emotion": "未知",
+                "intensity": 0,
+                "reason": f"LLM调用失败: {e}",
+                "demands": [],
+                "failed": True
+            }
         
         try:
             return json.loads(result)
@@ -119,6 +404,58 @@ class LLMAnalyzer:
                 "demands": []
             }
     
+    def analyze_sentiment_packed(self, comments: List[str]) -> List[Optional[Dict]]:
+        """在一次请求中分析多条评论的情感，解析失败的评论返回 None"""
+        if len(comments) == 1:
+            return [self.analyze_sentiment(comments[0])]
+        
+        comment_lines = "\n".join([
+            f"[{i}] {' '.join(comment.split())}"
+            for i, comment in enumerate(comments, 1)
+        ])
+        
+        prompt = f"""
+请逐条分析以下评论的情感倾向和潜在诉求。
+
+评论列表：
+{comment_lines}
+
+请按以下JSON数组格式返回，每条评论对应一个元素，index 与评论编号一致（只返回JSON）：
+[
+    {{
+        "index": 1,
+        "sentiment": "正面/负面/中性",
+        "emotion": "具体情绪（如：不满、愤怒、理解、讽刺、询问等）",
+        "intensity": "情感强度（1-10）",
+        "reason": "判断理由",
+        "demands": ["提取的诉求1", "提取的诉求2"]
+    }}
+]
+"""
+        
+        results = [None] * len(comments)
+        try:
+            result = self._call_llm(prompt, temperature=0.3, raise_on_error=True,
+                                    validate=_is_json_array)
+            items = json.loads(result)
+        except (LLMCallError, json.JSONDecodeError):
+            return results
+        
+        if not isinstance(items, list):
+            return results
+        
+        for item in items:
+            if not isinstance(item, dict) or 'sentiment' not in item:
+                continue
+            try:
+                index = int(item.pop('index')) - 1
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= index < len(comments):
+                results[index] = item
+        
+        return results
+    
     def judge_opinion_phase(self, event_info: Dict, stats: Dict, 
                            time_span: Dict, official_responses: List[Dict],
                            sentiment_summary: Dict) -> Dict:
@@ -0,0 +1,132 @@
+"""
+LLM响应缓存模块 - 基于SQLite的内容寻址磁盘缓存
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+class LLMResponseCache:
+    """LLM响应缓存（按模型、系统提示、提示词和温度寻址，按大小淘汰最久未使用的条目）"""
+    
+    def __init__(self, db_path: str, max_size_mb: float = 200):
+        """初始化缓存数据库"""
+        cache_dir = os.path.dirname(db_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        
+        self.db_path = db_path
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)"
+        )
+        self._conn.commit()
+        
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        self._total_size = row[0]
+    
+    @staticmethod
+    def make_key(model: str, system_prompt: str, prompt: str, temperature: float) -> str:
+        """根据请求内容生成缓存键"""
+        payload = json.dumps(
+            [model, system_prompt, prompt, temperature],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            
+            if row is None:
+                self.misses += 1
+                return None
+            
+            self._conn.execute(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+    
+    def set(self, key: str, response: str):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        size = len(response.encode('utf-8'))
+        
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                self._total_size -= row[0]
+            
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, size, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time())
+            )
+            self._total_size += size
+            
+            if self._total_size > self.max_size:
+                self._evict()
+            
+            self._conn.commit()
+    
+    def _evict(self):
+        """淘汰最久未使用的条目，直到占用降到容量的90%以下"""
+        target = int(self.max_size * 0.9)
+        rows = self._conn.execute(
+            "SELECT key, size FROM llm_cache ORDER BY last_access"
+        )
+        
+        evicted = []
+        for key, size in rows:
+            if self._total_size <= target:
+                break
+            evicted.append((key,))
+            self._total_size -= size
+        
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+    
+    def stats(self) -> Dict:
+        """获取缓存统计信息"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups > 0 else 0,
+            'evictions': self.evictions,
+            'entries': entries,
+            'size_mb': self._total_size / 1024 / 1024
+        }
+    
+    def close(self):
+        """关闭缓存数据库"""
+        with self._lock:
+            self._conn.close()
@@ -2,7 +2,9 @@
 主流程Pipeline
 """
 import json
+import os
 from datetime import datetime
+import config
 from data_parser import WeiboDataParser
 from llm_analyzer import LLMAnalyzer
 from kg_builder import KnowledgeGraphBuilder
@@ -11,10 +13,18 @@ from kg_builder import KnowledgeGraphBuilder
 class OpinionAnalysisPipeline:
     """舆情分析Pipeline"""
     
-    def __init__(self, json_file_path: str):
-        """初始化Pipeline"""
+    def __init__(self, json_file_path: str, streaming: bool = None):
+        """
+        初始化Pipeline
+        
+        streaming: 是否流式解析输入文件，默认按文件大小自动选择
+        """
         self.json_file_path = json_file_path
-        self.parser = WeiboDataParser(json_file_path)
+        if streaming is None:
+            file_size_mb = os.path.getsize(json_file_path) / 1024 / 1024
+            streaming = file_size_mb >= config.STREAMING_PARSE_THRESHOLD_MB
+        # 大文件同时使用列存储保存评论，降低常驻内存
+        self.parser = WeiboDataParser(json_file_path, streaming=streaming, columnar=streaming)
         self.analyzer = LLMAnalyzer()
         self.kg_builder = KnowledgeGraphBuilder()
         self.analysis_result = {}
@@ -57,6 +67,16 @@ class OpinionAnalysisPipeline:
             for label, count in stats['nodes'].items():
                 if count > 0:
                     print(f"  - {label}: {count}")
+            print(f"\n关系详情:")
+            for rel_type, count in stats['relationship_types'].items():
+                if count > 0:
+                    print(f"  - {rel_type}: {count}")
+            
+            event_url = self.analysis_result['event_info'].get('url')
+            if event_url:
+                event_stats = self.kg_builder.query_graph_stats(event_url=event_url)
+                print(f"\n本事件子图: {event_stats['total_nodes']} 个节点, "
+                      f"{event_stats['relationships']} 条关系")
         
         print("\n" + "="*60)
         print("Pipeline执行完成！")
@@ -83,6 +103,12 @@ class OpinionAnalysisPipeline:
         time_span = self.parser.get_time_span()
         print(f"  ✓ 时间跨度: {time_span['span_days']} 天")
         
+        # 每日评论量（复用解析阶段建立的时间戳索引）
+        activity_by_day = self.parser.get_time_index().per_day()
+        if activity_by_day:
+            peak_day = max(activity_by_day, key=activity_by_day.get)
+            print(f"  ✓ 评论高峰: {peak_day} ({activity_by_day[peak_day]} 条)")
+        
         # 官方回应
         official_responses = self.parser.get_official_responses()
         print(f"  ✓ 官方回应: {len(official_responses)} 次")
@@ -93,6 +119,7 @@ class OpinionAnalysisPipeline:
             'comments': comments,
             'stats': stats,
             'time_span': time_span,
+            'activity_by_day': activity_by_day,
             'official_responses': official_responses
         })
     
@@ -111,6 +138,18 @@ class OpinionAnalysisPipeline:
         sentiment_results = self.analyzer.analyze_sentiment_batch(
             self.analysis_result['comments']
         )
+        batch_stats = self.analyzer.batch_stats
+        if batch_stats.get('dedup_saved'):
+            print(f"  ✓ 评论去重: {batch_stats['comments']} 条评论仅分析 {batch_stats['analyzed']} 条，"
+                  f"节省调用 {batch_stats['dedup_saved']} 次")
+        if self.analyzer.local_classifier and batch_stats.get('comments'):
+            local = batch_stats['local_classified']
+            unique = local + batch_stats['analyzed']
+            print(f"  ✓ 本地词典判定: {local} 条 ({local / unique:.1%}) | "
+                  f"提交LLM: {batch_stats['analyzed']} 条 ({batch_stats['analyzed'] / unique:.1%})")
+        if batch_stats.get('packed_requests'):
+            print(f"  ✓ 打包请求: {batch_stats['packed_requests']} 次 | "
+                  f"逐条请求: {batch_stats['single_requests']} 次")
         
         # 统计情感分布
         sentiment_dist = {'正面': 0, '负面': 0, '中性': 0}
@@ -120,6 +159,8 @@ class OpinionAnalysisPipeline:
         
         print(f"  ✓ 情感分布: 正面{sentiment_dist['正面']} | "
               f"负面{sentiment_dist['负面']} | 中性{sentiment_dist['中性']}")
+        if sentiment_dist.get('未知'):
+            print(f"  ✗ 调用失败未能分析: {sentiment_dist['未知']} 条")
         
         # 3. 提取诉求
         print("  → 提取关键诉求...")
@@ -146,6 +187,15 @@ class OpinionAnalysisPipeline:
         )
         print(f"  ✓ 建议方案数: {len(solutions.get('suggested_solutions', []))}")
         
+        call_stats = self.analyzer.call_stats
+        print(f"  ✓ LLM请求: {call_stats['requests']} 次 | 重试 {call_stats['retries']} 次 | "
+              f"失败 {call_stats['failures']} 次")
+        
+        if self.analyzer.cache:
+            cache_stats = self.analyzer.cache.stats()
+            print(f"  ✓ LLM缓存: 命中 {cache_stats['hits']} | 未命中 {cache_stats['misses']} | "
+                  f"命中率 {cache_stats['hit_rate']:.1%}")
+        
         # 保存到结果
         self.analysis_result.update({
             'topic_analysis': topic_analysis,
@@ -161,14 +211,15 @@ class OpinionAnalysisPipeline:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_file = f"output/analysis_result_{timestamp}.json"
         
-        # 移除不可序列化的对象
-        save_data = {
-            k: v for k, v in self.analysis_result.items()
-            if k != 'comments' or isinstance(v, (dict, list, str, int, float, bool))
-        }
+        save_data = {k: v for k, v in self.analysis_result.items() if k != 'comments'}
         
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(save_data, f, ensure_ascii=False, indent=2)
+            # 评论可能是列式存储（CommentStore），逐组写出，不一次性展开为字典列表
+            head = json.dumps(save_data, ensure_ascii=False, indent=2)
+            f.write(head[:-2] + ',\n  "comments": [' if save_data else '{\n  "comments": [')
+            for i, group in enumerate(self.analysis_result.get('comments', [])):
+                f.write((',' if i else '') + '\n    ' + json.dumps(group, ensure_ascii=False))
+            f.write('\n  ]\n}\n')
         
         print(f"  ✓ 结果已保存: {output_file}")
         
@@ -207,6 +258,7 @@ class OpinionAnalysisPipeline:
     
     def close(self):
         """关闭资源"""
+        self.analyzer.close()
         self.kg_builder.close()
 
 
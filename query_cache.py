@@ -0,0 +1,113 @@
+"""
+图谱查询结果缓存模块 - 进程内TTL缓存，图谱写入时按事件失效
+"""
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import config
+
+
+class QueryResultCache:
+    """
+    查询结果缓存（按事件、查询名称和参数寻址，每个条目有各自的过期时间）
+    
+    图谱构建器写入某个事件后调用 invalidate(event_url)，清除该事件和全库查询的缓存。
+    其他进程的写入无法感知，只能等条目过期。
+    """
+    
+    def __init__(self, default_ttl: float = 60, enabled: bool = True):
+        """初始化缓存"""
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        
+        self._lock = threading.Lock()
+        self._entries = {}     # 缓存键 -> (过期时间, 结果)
+        self._generation = 0   # 每次失效加一，用于丢弃失效前开始的查询结果
+    
+    @staticmethod
+    def make_key(event_url: Optional[str], name: str, params: Dict) -> Tuple:
+        """根据事件、查询名称和参数生成缓存键"""
+        return (event_url, name, tuple(sorted(params.items())))
+    
+    @property
+    def generation(self) -> int:
+        """当前失效代数，查询前读取，写回时传给 set"""
+        return self._generation
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回 None"""
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, key: Hashable, value: Any, ttl: float = None, generation: int = None):
+        """
+        写入缓存
+        
+        Args:
+            ttl: 有效期（秒），默认使用 default_ttl，不大于 0 时不缓存
+            generation: 查询开始前的失效代数，期间发生过失效则丢弃该结果
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        if not self.enabled or ttl <= 0:
+            return
+        
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + ttl, value)
+    
+    def invalidate(self, event_url: str = None):
+        """
+        使缓存失效
+        
+        Args:
+            event_url: 指定时清除该事件和全库查询（事件为 None）的条目，否则全部清除
+        """
+        with self._lock:
+            self._generation += 1
+            if event_url is None:
+                removed = list(self._entries)
+            else:
+                removed = [key for key in self._entries if key[0] in (event_url, None)]
+            for key in removed:
+                del self._entries[key]
+            self.invalidations += 1
+    
+    def stats(self) -> Dict:
+        """获取缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups > 0 else 0,
+            'invalidations': self.invalidations,
+            'entries': len(self._entries)
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryResultCache:
+    """获取进程内共享的查询结果缓存（图谱构建器和可视化工具共用，以便写入后及时失效）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = QueryResultCache(config.VIS_CACHE_TTL, config.VIS_CACHE_ENABLED)
+        return _cache
@@ -0,0 +1,113 @@
+"""
+限流与熔断模块 - 令牌桶限流器和熔断器，供多个工作线程共享
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """令牌桶限流器（按每分钟速率补充，容量默认为一分钟的配额）"""
+    
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        """初始化令牌桶，速率不大于0时不限流"""
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        """按流逝时间补充令牌"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def acquire(self, amount: float = 1):
+        """获取令牌，不足时阻塞等待"""
+        if self.rate <= 0:
+            return
+        
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+    
+    def adjust(self, amount: float):
+        """按实际用量修正已扣除的令牌（正数为补扣，负数为返还，可透支）"""
+        if self.rate <= 0:
+            return
+        
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class CircuitBreaker:
+    """熔断器（连续失败达到阈值后暂停所有调用，冷却后放行一次试探请求）"""
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30):
+        """初始化熔断器"""
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.trips = 0
+        
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        self._cond = threading.Condition()
+    
+    def before_call(self):
+        """调用前检查，熔断期间阻塞等待"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                
+                if self.state == self.OPEN:
+                    if now < self._open_until:
+                        self._cond.wait(self._open_until - now)
+                        continue
+                    self.state = self.HALF_OPEN
+                    self._probing = False
+                
+                if self.state == self.HALF_OPEN:
+                    if self._probing:
+                        self._cond.wait(self.cooldown)
+                        continue
+                    self._probing = True
+                
+                return
+    
+    def record_success(self):
+        """记录成功调用，关闭熔断"""
+        with self._cond:
+            self._failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                self.state = self.CLOSED
+                print("LLM服务已恢复，熔断关闭")
+            self._cond.notify_all()
+    
+    def record_failure(self):
+        """记录失败调用，达到阈值或试探失败时打开熔断"""
+        with self._cond:
+            self._failures += 1
+            self._probing = False
+            
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state == self.CLOSED:
+                    self.trips += 1
+                    print(f"LLM服务连续失败 {self._failures} 次，熔断并暂停调用 {self.cooldown:g} 秒")
+                self.state = self.OPEN
+                self._open_until = time.monotonic() + self.cooldown
+            
+            self._cond.notify_all()
@@ -0,0 +1,159 @@
+"""
+本地情感预分类模块 - 基于jieba分词、情感词典和否定规则
+"""
+import logging
+import os
+from typing import Dict, List, Optional
+
+import jieba
+import numpy as np
+
+jieba.setLogLevel(logging.INFO)
+
+
+# 内置情感词典（权重为正表示正面，为负表示负面），侧重公共交通类舆情
+DEFAULT_LEXICON = {
+    # 正面
+    '谢谢': 2.0, '感谢': 2.0, '辛苦': 1.5, '辛苦了': 2.0, '理解': 1.0, '点赞': 2.0,
+    '给力': 2.0, '及时': 1.0, '不错': 1.5, '满意': 2.0, '支持': 1.0, '加油': 1.5,
+    '温暖': 1.5, '贴心': 1.5, '好评': 2.0, '棒': 1.5, '厉害': 1.0, '靠谱': 1.5,
+    '方便': 1.0, '顺利': 1.0, '安全': 0.5, '感动': 1.5, '赞': 1.5, '喜欢': 1.5,
+    # 负面
+    '无语': -2.0, '迟到': -1.5, '故障': -0.5, '垃圾': -2.5, '服了': -2.0, '真服了': -2.5,
+    '离谱': -2.0, '生气': -2.0, '愤怒': -2.5, '失望': -2.0, '差': -1.5, '太差': -2.5,
+    '烂': -2.0, '坑': -1.5, '投诉': -2.0, '扣钱': -2.0, '难受': -1.5, '闷死': -2.0,
+    '崩溃': -2.0, '恶心': -2.5, '搞笑': -1.5, '气死': -2.5, '不行': -1.5, '太扯': -2.0,
+    '扯': -1.5, '耽误': -1.5, '延误': -0.5, '致歉信': -1.0, '道歉信': -1.0, '麻痹': -2.5,
+    '草台班子': -2.5, '吃干饭': -2.5, '烦': -1.5, '累': -1.0, '挤': -1.0, '爆挤': -2.0,
+    '折腾': -1.5, '糟糕': -2.0, '破': -1.0, '老故障': -2.0, '又坏了': -2.0, '怒': -2.0,
+}
+
+# 否定词：出现在情感词之前的窗口内时翻转情感极性
+DEFAULT_NEGATORS = {
+    '不', '没', '没有', '别', '非', '无', '未', '不是', '并不', '从不', '绝不', '不太', '毫不',
+}
+
+# 程度副词：出现在情感词之前的窗口内时放大或减弱权重
+DEFAULT_DEGREES = {
+    '太': 1.5, '非常': 1.5, '特别': 1.5, '超': 1.5, '超级': 1.8, '极其': 2.0, '最': 1.8,
+    '真': 1.3, '真的': 1.3, '很': 1.3, '好': 1.2, '有点': 0.7, '稍微': 0.6, '略': 0.6,
+}
+
+
+class LexiconSentimentClassifier:
+    """本地词典情感分类器（向量化计算，低置信度的评论交给LLM处理）"""
+    
+    def __init__(self, lexicon_path: str = None, window: int = 2, strength_scale: float = 2.0):
+        """
+        初始化分类器
+        
+        lexicon_path: 可选的自定义词典文件（每行 “词<TAB>权重”），与内置词典合并
+        window: 否定词和程度副词向前作用的词数
+        strength_scale: 置信度随命中情感总量增长的尺度，越大越保守
+        """
+        lexicon = dict(DEFAULT_LEXICON)
+        if lexicon_path and os.path.exists(lexicon_path):
+            lexicon.update(self._load_lexicon(lexicon_path))
+        
+        for word in list(lexicon) + list(DEFAULT_NEGATORS) + list(DEFAULT_DEGREES):
+            jieba.add_word(word)
+        
+        self.window = window
+        self.strength_scale = strength_scale
+        self.vocab = {word: i for i, word in enumerate(lexicon)}
+        self.weights = np.array(list(lexicon.values()), dtype=np.float64)
+    
+    @staticmethod
+    def _load_lexicon(path: str) -> Dict[str, float]:
+        """加载自定义词典"""
+        lexicon = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.strip().split('\t')
+                if len(parts) == 2:
+                    lexicon[parts[0]] = float(parts[1])
+        return lexicon
+    
+    def score(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """批量计算情感得分，返回每条评论的正面/负面得分、命中数和置信度"""
+        token_lists = [jieba.lcut(text) for text in texts]
+        
+        lengths = np.array([len(tokens) for tokens in token_lists], dtype=np.int64)
+        flat_tokens = [token for tokens in token_lists for token in tokens]
+        doc_ids = np.repeat(np.arange(len(texts)), lengths)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(texts) else lengths
+        positions = np.arange(len(flat_tokens)) - np.repeat(starts, lengths)
+        
+        ids = np.array([self.vocab.get(token, -1) for token in flat_tokens], dtype=np.int64)
+        is_negator = np.array([token in DEFAULT_NEGATORS for token in flat_tokens], dtype=bool)
+        degrees = np.array([DEFAULT_DEGREES.get(token, 1.0) for token in flat_tokens])
+        
+        hit = ids >= 0
+        token_scores = np.where(hit, self.weights[np.maximum(ids, 0)], 0.0)
+        
+        # 在同一条评论内向前查看窗口，统计否定词数量并累乘程度副词
+        negations = np.zeros(len(flat_tokens), dtype=np.int64)
+        multipliers = np.ones(len(flat_tokens))
+        for k in range(1, self.window + 1):
+            in_doc = positions >= k
+            negations[k:] += (is_negator[:-k] & in_doc[k:])
+            multipliers[k:] *= np.where(in_doc[k:], degrees[:-k], 1.0)
+        
+        token_scores *= np.where(negations % 2 == 1, -1.0, 1.0) * multipliers
+        
+        count = len(texts)
+        positive = np.bincount(doc_ids, weights=np.clip(token_scores, 0, None), minlength=count)
+        negative = np.bincount(doc_ids, weights=np.clip(-token_scores, 0, None), minlength=count)
+        hits = np.bincount(doc_ids, weights=hit.astype(np.float64), minlength=count)
+        
+        mass = positive + negative
+        purity = np.divide(np.abs(positive - negative), mass, out=np.zeros(count), where=mass > 0)
+        confidence = purity * (1 - np.exp(-mass / self.strength_scale))
+        
+        return {
+            'positive': positive,
+            'negative': negative,
+            'hits': hits,
+            'confidence': confidence,
+            'tokens': token_lists
+        }
+    
+    def classify(self, texts: List[str], threshold: float) -> List[Optional[Dict]]:
+        """批量预分类，置信度不低于阈值的返回情感结果，其余返回 None 交给LLM"""
+        scores = self.score(texts)
+        results = []
+        
+        for i, tokens in enumerate(scores['tokens']):
+            confidence = scores['confidence'][i]
+            if confidence < threshold:
+                results.append(None)
+                continue
+            
+            polarity = scores['positive'][i] - scores['negative'][i]
+            matched = [token for token in dict.fromkeys(tokens) if token in self.vocab]
+            
+            results.append({
+                "sentiment": "正面" if polarity > 0 else "负面",
+                "emotion": "认可" if polarity > 0 else "不满",
+                "intensity": int(min(10, 5 + round(abs(polarity)))),
+                "reason": f"本地词典判定（置信度{confidence:.2f}），命中：{'、'.join(matched)}",
+                "demands": []
+            })
+        
+        return results
+
+
+if __name__ == "__main__":
+    # 测试代码
+    from data_parser import WeiboDataParser
+    
+    parser = WeiboDataParser("weibo_comments_full.json")
+    texts = [c['main_comment']['content'] for c in parser.extract_comments()]
+    
+    classifier = LexiconSentimentClassifier()
+    results = classifier.classify(texts, threshold=0.75)
+    local = sum(1 for r in results if r)
+    print(f"本地判定: {local}/{len(texts)}")
+    for text, result in zip(texts, results):
+        if result:
+            print(f"[{result['sentiment']}] {text[:40]}  {result['reason']}")
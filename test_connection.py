@@ -72,27 +72,19 @@ def test_neo4j():
     print("\n测试Neo4j连接...")
     
     try:
-        from neo4j import GraphDatabase
-        import config
-        
-        driver = GraphDatabase.driver(
-            config.NEO4J_URI,
-            auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
-        )
-        
-        with driver.session() as session:
-            result = session.run("RETURN 1 as test")
-            record = result.single()
-            if record and record['test'] == 1:
-                print("  ✓ Neo4j连接成功")
-                
-                # 检查是否有数据
-                result = session.run("MATCH (n) RETURN count(n) as count")
-                count = result.single()['count']
-                print(f"  ✓ 数据库中有 {count} 个节点")
-                
-                driver.close()
-                return True
+        from graph_backend import Neo4jBackend
+        
+        backend = Neo4jBackend()
+        backend.driver.verify_connectivity()
+        record = backend.read('ping', "RETURN 1 as test")[0]
+        if record and record['test'] == 1:
+            print("  ✓ Neo4j连接成功")
+            
+            # 检查是否有数据
+            count = backend.read('node_count', "MATCH (n) RETURN count(n) as count")[0]['count']
+            print(f"  ✓ 数据库中有 {count} 个节点")
+            
+            return True
         
     except Exception as e:
         print(f"  ✗ Neo4j连接失败: {e}")
@@ -0,0 +1,63 @@
+"""
+数据解析测试 - 增量JSON解析在任意块边界下与 json.loads 结果一致
+"""
+import io
+import json
+
+from data_parser import JsonObjectStream
+
+
+SAMPLE = json.dumps({
+    'topic': '测试话题',
+    'score': 1.5,
+    'ratio': -0.125,
+    'big': 6.02e23,
+    'small': 1.5E-7,
+    'count': 12345,
+    'flags': [True, False, None],
+    'comment_groups': [
+        {'index': 1, 'intensity': 7.25, 'likes': 3e2, 'content': '评论，"引号"'},
+        {'index': 2, 'intensity': -1e-3, 'likes': 0, 'replies': [{'weight': 0.5}]},
+        12.75,
+        -3E+4
+    ],
+    'tail': 2.0
+}, ensure_ascii=False)
+
+
+def parse(text: str, chunk_size: int):
+    """按指定块大小增量解析，返回还原后的对象"""
+    result = {}
+    for key, value in JsonObjectStream(io.StringIO(text), chunk_size=chunk_size).items('comment_groups'):
+        if key == 'comment_groups':
+            result.setdefault(key, []).append(value)
+        else:
+            result[key] = value
+    return result
+
+
+def test_numbers_split_across_chunks():
+    """浮点数和指数在任何位置被块边界截断都能正确解析"""
+    expected = json.loads(SAMPLE)
+    for chunk_size in range(1, len(SAMPLE) + 2):
+        assert parse(SAMPLE, chunk_size) == expected, f"chunk_size={chunk_size}"
+
+
+def test_compact_document():
+    """无空白的紧凑写法同样正确"""
+    text = json.dumps(json.loads(SAMPLE), ensure_ascii=False, separators=(',', ':'))
+    expected = json.loads(text)
+    for chunk_size in range(1, 40):
+        assert parse(text, chunk_size) == expected, f"chunk_size={chunk_size}"
+
+
+def test_reported_case():
+    """"1.5" 在 "." 之后被截断"""
+    assert parse('{"x": 1.5, "y": 2}', 8) == {'x': 1.5, 'y': 2}
+
+
+if __name__ == "__main__":
+    test_numbers_split_across_chunks()
+    test_compact_document()
+    test_reported_case()
+    print("✓ 全部通过")
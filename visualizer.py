@@ -1,178 +1,373 @@
 """
 知识图谱可视化模块
 """
-from neo4j import GraphDatabase
-import config
-from typing import Dict, List
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+import gzip
+import hashlib
+import heapq
 import json
+import os
+from graph_backend import GraphBackend, create_backend
+from kg_builder import SCHEMA, KnowledgeGraphBuilder
+from query_cache import QueryResultCache, get_query_cache
+
+
+# 所有查询都从 $url 指定的事件节点出发遍历，耗时只与该事件的规模有关
+LATEST_EVENT_QUERY = """
+MATCH (e:Event)
+RETURN e.url as url
+ORDER BY e.updated_at DESC
+LIMIT 1
+"""
+
+EVENT_SUMMARY_QUERY = """
+MATCH (e:Event {url: $url})
+OPTIONAL MATCH (e)-[:处于]->(p:OpinionPhase)
+OPTIONAL MATCH (o:Organization)-[:发布]->(e)
+RETURN e.url as url,
+       e.content as content, 
+       e.event_type as event_type,
+       e.comment_count as comment_count,
+       e.reply_count as reply_count,
+       p.phase as phase,
+       o.name as organization
+LIMIT 1
+"""
+
+SENTIMENT_DISTRIBUTION_QUERY = """
+MATCH (:Event {url: $url})<-[:评论]-(c:Comment)
+RETURN c.sentiment as sentiment, count(*) as count
+ORDER BY count DESC
+"""
+
+# 诉求节点由多个事件共享，提及用户数只统计本事件中发表过包含该诉求评论的用户
+TOP_DEMANDS_QUERY = """
+MATCH (:Event {url: $url})<-[:评论]-(c:Comment)-[:包含]->(d:Demand)
+MATCH (u:User)-[:发表]->(c)
+RETURN d.content as demand, 
+       d.frequency as frequency,
+       count(DISTINCT u) as user_count
+ORDER BY user_count DESC
+LIMIT $limit
+"""
+
+SOLUTIONS_QUERY = """
+MATCH (:Event {url: $url})<-[:针对|建议针对]-(s:Solution)
+RETURN s.type as type, s.content as content
+ORDER BY s.type
+"""
+
+INTERACTION_NETWORK_QUERY = """
+MATCH (:Event {url: $url})<-[:评论]-(c:Comment)<-[:回复]-(r:Reply)<-[:发表]-(u1:User)
+MATCH (c)<-[:发表]-(u2:User)
+RETURN u1.name as from_user, 
+       u2.name as to_user, 
+       count(*) as interaction_count
+ORDER BY interaction_count DESC
+LIMIT $limit
+"""
+
+NEGATIVE_COMMENTS_QUERY = """
+MATCH (:Event {url: $url})<-[:评论]-(c:Comment)
+WHERE c.sentiment = '负面'
+MATCH (u:User)-[:发表]->(c)
+RETURN u.name as author,
+       c.content as content,
+       c.emotion as emotion,
+       c.intensity as intensity,
+       c.time as time
+ORDER BY c.intensity DESC
+LIMIT $limit
+"""
+
+# 全图导出：每个标签按唯一键做键集分页（WHERE key > 上一页末尾 ORDER BY key），由唯一约束的索引顺序读取
+EXPORT_KEYS = {label: prop for _, kind, label, prop in SCHEMA if kind == 'unique'}
+
+EXPORT_NODES_QUERY = """
+MATCH (n:{label})
+WHERE {condition}
+RETURN n.{prop} as key, properties(n) as props
+ORDER BY n.{prop}
+LIMIT $limit
+"""
+
+# 按起点分页导出出边，终点用 “标签:唯一键” 表示（与 kg_csv_export 的导入ID一致）
+EXPORT_EDGES_QUERY = """
+MATCH (n:{label})
+WHERE {condition}
+WITH n
+ORDER BY n.{prop}
+LIMIT $limit
+OPTIONAL MATCH (n)-[r]->(b)
+WITH n, r, b, head(labels(b)) as end_label
+RETURN n.{prop} as key,
+       collect(CASE WHEN r IS NOT NULL THEN {{
+           type: type(r), end_label: end_label, end_key: b[$keys[end_label]], props: properties(r)
+       }} END) as edges
+ORDER BY key
+"""
+
+# 事件的评论线程（评论、作者、诉求、回复）：评论键以事件URL哈希开头，按前缀在唯一索引上分页
+EVENT_COMMENT_THREADS_QUERY = """
+MATCH (c:Comment)
+WHERE c.key STARTS WITH $prefix AND c.key > $after
+WITH c
+ORDER BY c.key
+LIMIT $limit
+RETURN c.key as key,
+       c.content as content,
+       c.sentiment as sentiment,
+       c.intensity as intensity,
+       [(u:User)-[:发表]->(c) | u.name][0] as author,
+       [(c)-[:包含]->(d:Demand) | d.content] as demands,
+       [(c)<-[:回复]-(r:Reply) | {
+           key: r.key, content: r.content, author: [(ru:User)-[:发表]->(r) | ru.name][0]
+       }] as replies
+"""
+
+# 交互式图谱的按需展开：双击聚合节点（或有回复的评论）时加载预计算的分块脚本
+# 分块以 JS 包装的 JSON 保存，直接用浏览器打开本地 HTML 文件也能加载
+LAZY_EXPAND_SCRIPT = """
+<script type="text/javascript">
+    var chunkDir = %(chunk_dir)s;
+    var pendingChunks = %(pending)s;
+    window.graphChunk = function (chunk) {
+        var origin = network.getPositions([chunk.origin])[chunk.origin] || {x: 0, y: 0};
+        chunk.nodes.forEach(function (node) {
+            if (!nodes.get(node.id)) {
+                node.x = origin.x + (Math.random() - 0.5) * 300;
+                node.y = origin.y + (Math.random() - 0.5) * 300;
+            }
+        });
+        nodes.update(chunk.nodes);
+        edges.update(chunk.edges);
+        network.setOptions({physics: {enabled: true}});
+        network.stabilize(100);
+    };
+    network.on("stabilized", function () {
+        network.setOptions({physics: {enabled: false}});
+    });
+    network.on("doubleClick", function (params) {
+        var id = params.nodes[0];
+        var queue = pendingChunks[id];
+        if (!queue || !queue.length) {
+            return;
+        }
+        var script = document.createElement("script");
+        script.src = chunkDir + "/" + queue.shift() + ".js";
+        document.body.appendChild(script);
+        var node = nodes.get(id);
+        nodes.update({id: id, label: node.baseLabel + (queue.length ? "（剩余 " + queue.length + " 批）" : "")});
+    });
+</script>
+"""
+
+# 报告/导出的各部分：名称 -> (后端操作名, 查询语句, 结果整理方法)
+SECTIONS = {
+    'event_summary': ('event_summary', EVENT_SUMMARY_QUERY, '_format_event_summary'),
+    'sentiment_distribution': ('sentiment_distribution', SENTIMENT_DISTRIBUTION_QUERY,
+                               '_format_sentiment_distribution'),
+    'top_demands': ('top_demands', TOP_DEMANDS_QUERY, '_format_top_demands'),
+    'solutions': ('solutions', SOLUTIONS_QUERY, '_format_solutions'),
+    'user_interactions': ('interaction_network', INTERACTION_NETWORK_QUERY, '_format_user_interactions'),
+    'negative_comments': ('negative_comments', NEGATIVE_COMMENTS_QUERY, '_format_negative_comments')
+}
 
 
 class GraphVisualizer:
     """图谱可视化工具"""
     
-    def __init__(self):
-        """初始化连接"""
-        self.driver = GraphDatabase.driver(
-            config.NEO4J_URI,
-            auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
-        )
+    def __init__(self, backend: GraphBackend = None, cache: QueryResultCache = None,
+                 cache_ttls: Dict[str, float] = None, event_url: str = None):
+        """
+        初始化图存储后端和查询结果缓存
+        
+        Args:
+            backend: 图存储后端，默认按 GRAPH_BACKEND 配置创建（Neo4j 或内存图）
+            cache: 查询结果缓存，默认使用进程内共享缓存（图谱构建器写入后自动失效）
+            cache_ttls: 各部分的缓存有效期（秒），如 {'user_interactions': 300}，
+                        未指定的部分使用 VIS_CACHE_TTL，设为 0 表示该部分不缓存
+            event_url: 默认查询的事件URL，未指定时使用最近写入的事件
+        """
+        self.backend = backend or create_backend()
+        self.cache = cache or get_query_cache()
+        self.cache_ttls = cache_ttls or {}
+        self.event_url = event_url
     
     def close(self):
         """关闭连接"""
-        self.driver.close()
+        self.backend.close()
+    
+    def latest_event_url(self) -> Optional[str]:
+        """最近写入（更新）的事件URL，图谱为空时返回 None"""
+        key = self.cache.make_key(None, 'latest_event', {})
+        result = self.cache.get(key)
+        if result is None:
+            generation = self.cache.generation
+            result = self.backend.read('latest_event', LATEST_EVENT_QUERY)
+            self.cache.set(key, result, self.cache_ttls.get('latest_event'), generation)
+        return result[0]['url'] if result else None
     
-    def get_event_summary(self) -> Dict:
+    def _resolve_event(self, event_url: str = None) -> Optional[str]:
+        return event_url or self.event_url or self.latest_event_url()
+    
+    def get_sections(self, sections: Dict[str, Dict], event_url: str = None) -> Dict:
+        """
+        在同一个只读事务中取回某个事件的多个部分（各部分数据来自同一快照），优先使用缓存
+        
+        Args:
+            sections: 部分名称 -> 查询参数，名称见 SECTIONS
+            event_url: 事件URL，默认使用初始化时指定的事件或最近写入的事件
+        
+        Returns:
+            部分名称 -> 整理后的结果
+        """
+        event_url = self._resolve_event(event_url)
+        results = {}
+        keys = {}
+        for name, params in sections.items():
+            keys[name] = self.cache.make_key(event_url, name, params)
+            cached = self.cache.get(keys[name])
+            if cached is not None:
+                results[name] = cached
+        
+        # 未命中缓存的部分在一个读事务中查询
+        missing = [name for name in sections if name not in results]
+        if missing:
+            generation = self.cache.generation
+            requests = [(SECTIONS[name][0], SECTIONS[name][1], dict(sections[name], url=event_url))
+                        for name in missing]
+            for name, result in zip(missing, self.backend.read_many(requests)):
+                results[name] = result
+                self.cache.set(keys[name], result, self.cache_ttls.get(name), generation)
+        
+        # 缓存原始记录，每次重新整理，调用方修改返回值不影响缓存
+        return {name: getattr(self, SECTIONS[name][2])(results[name]) for name in sections}
+    
+    def _get(self, name: str, event_url: str = None, **params):
+        return self.get_sections({name: params}, event_url)[name]
+    
+    def get_event_summary(self, event_url: str = None) -> Dict:
         """获取事件摘要"""
-        with self.driver.session() as session:
-            query = """
-            MATCH (e:Event)
-            OPTIONAL MATCH (e)-[:处于]->(p:OpinionPhase)
-            OPTIONAL MATCH (o:Organization)-[:发布]->(e)
-            RETURN e.content as content, 
-                   e.event_type as event_type,
-                   e.comment_count as comment_count,
-                   e.reply_count as reply_count,
-                   p.phase as phase,
-                   o.name as organization
-            LIMIT 1
-            """
-            result = session.run(query)
-            record = result.single()
-            
-            if record:
-                return {
-                    'content': record['content'],
-                    'event_type': record['event_type'],
-                    'comment_count': record['comment_count'],
-                    'reply_count': record['reply_count'],
-                    'opinion_phase': record['phase'],
-                    'organization': record['organization']
-                }
-            return {}
+        return self._get('event_summary', event_url)
     
-    def get_sentiment_distribution(self) -> Dict:
+    def get_sentiment_distribution(self, event_url: str = None) -> Dict:
         """获取情感分布"""
-        with self.driver.session() as session:
-            query = """
-            MATCH (c:Comment)
-            RETURN c.sentiment as sentiment, count(*) as count
-            ORDER BY count DESC
-            """
-            result = session.run(query)
-            
-            distribution = {}
-            for record in result:
-                distribution[record['sentiment']] = record['count']
-            
-            return distribution
+        return self._get('sentiment_distribution', event_url)
     
-    def get_top_demands(self, limit: int = 10) -> List[Dict]:
+    def get_top_demands(self, limit: int = 10, event_url: str = None) -> List[Dict]:
         """获取主要诉求"""
-        with self.driver.session() as session:
-            query = """
-            MATCH (d:Demand)<-[:提出]-(u:User)
-            RETURN d.content as demand, 
-                   d.frequency as frequency,
-                   count(u) as user_count
-            ORDER BY user_count DESC
-            LIMIT $limit
-            """
-            result = session.run(query, limit=limit)
-            
-            demands = []
-            for record in result:
-                demands.append({
-                    'demand': record['demand'],
-                    'frequency': record['frequency'],
-                    'user_count': record['user_count']
-                })
-            
-            return demands
+        return self._get('top_demands', event_url, limit=limit)
     
-    def get_solutions(self) -> Dict:
+    def get_solutions(self, event_url: str = None) -> Dict:
         """获取解决方案"""
-        with self.driver.session() as session:
-            query = """
-            MATCH (s:Solution)
-            RETURN s.type as type, s.content as content
-            ORDER BY s.type
-            """
-            result = session.run(query)
-            
-            solutions = {
-                '已采取措施': [],
-                '建议方案': []
-            }
-            
-            for record in result:
-                sol_type = record['type']
-                content = record['content']
-                
-                if sol_type in solutions:
-                    solutions[sol_type].append(content)
-            
-            return solutions
+        return self._get('solutions', event_url)
     
-    def get_user_interaction_network(self, limit: int = 20) -> Dict:
+    def get_user_interaction_network(self, limit: int = 20, event_url: str = None) -> Dict:
         """获取用户互动网络"""
-        with self.driver.session() as session:
-            query = """
-            MATCH (u1:User)-[:发表]->(r:Reply)-[:回复]->(c:Comment)<-[:发表]-(u2:User)
-            RETURN u1.name as from_user, 
-                   u2.name as to_user, 
-                   count(*) as interaction_count
-            ORDER BY interaction_count DESC
-            LIMIT $limit
-            """
-            result = session.run(query, limit=limit)
-            
-            interactions = []
-            for record in result:
-                interactions.append({
-                    'from': record['from_user'],
-                    'to': record['to_user'],
-                    'count': record['interaction_count']
-                })
-            
-            return {'interactions': interactions}
+        return self._get('user_interactions', event_url, limit=limit)
     
-    def get_negative_comments(self, limit: int = 10) -> List[Dict]:
+    def get_negative_comments(self, limit: int = 10, event_url: str = None) -> List[Dict]:
         """获取负面评论"""
-        with self.driver.session() as session:
-            query = """
-            MATCH (u:User)-[:发表]->(c:Comment)
-            WHERE c.sentiment = '负面'
-            RETURN u.name as author,
-                   c.content as content,
-                   c.emotion as emotion,
-                   c.intensity as intensity,
-                   c.time as time
-            ORDER BY c.intensity DESC
-            LIMIT $limit
-            """
-            result = session.run(query, limit=limit)
-            
-            comments = []
-            for record in result:
-                comments.append({
-                    'author': record['author'],
-                    'content': record['content'],
-                    'emotion': record['emotion'],
-                    'intensity': record['intensity'],
-                    'time': record['time']
-                })
+        return self._get('negative_comments', event_url, limit=limit)
+    
+    @staticmethod
+    def _format_event_summary(result: List[Dict]) -> Dict:
+        record = result[0] if result else None
+        
+        if record:
+            return {
+                'url': record['url'],
+                'content': record['content'],
+                'event_type': record['event_type'],
+                'comment_count': record['comment_count'],
+                'reply_count': record['reply_count'],
+                'opinion_phase': record['phase'],
+                'organization': record['organization']
+            }
+        return {}
+    
+    @staticmethod
+    def _format_sentiment_distribution(result: List[Dict]) -> Dict:
+        distribution = {}
+        for record in result:
+            distribution[record['sentiment']] = record['count']
+        
+        return distribution
+    
+    @staticmethod
+    def _format_top_demands(result: List[Dict]) -> List[Dict]:
+        demands = []
+        for record in result:
+            demands.append({
+                'demand': record['demand'],
+                'frequency': record['frequency'],
+                'user_count': record['user_count']
+            })
+        
+        return demands
+    
+    @staticmethod
+    def _format_solutions(result: List[Dict]) -> Dict:
+        solutions = {
+            '已采取措施': [],
+            '建议方案': []
+        }
+        
+        for record in result:
+            sol_type = record['type']
+            content = record['content']
             
-            return comments
+            if sol_type in solutions:
+                solutions[sol_type].append(content)
+        
+        return solutions
+    
+    @staticmethod
+    def _format_user_interactions(result: List[Dict]) -> Dict:
+        interactions = []
+        for record in result:
+            interactions.append({
+                'from': record['from_user'],
+                'to': record['to_user'],
+                'count': record['interaction_count']
+            })
+        
+        return {'interactions': interactions}
+    
+    @staticmethod
+    def _format_negative_comments(result: List[Dict]) -> List[Dict]:
+        comments = []
+        for record in result:
+            comments.append({
+                'author': record['author'],
+                'content': record['content'],
+                'emotion': record['emotion'],
+                'intensity': record['intensity'],
+                'time': record['time']
+            })
+        
+        return comments
     
-    def generate_report(self) -> str:
-        """生成分析报告"""
+    def generate_report(self, event_url: str = None) -> str:
+        """生成某个事件的分析报告（默认使用初始化时指定的事件或最近写入的事件）"""
         report = []
         report.append("="*70)
         report.append("舆情分析报告")
         report.append("="*70)
         
+        # 所有部分在一个读事务中取回
+        data = self.get_sections({
+            'event_summary': {},
+            'sentiment_distribution': {},
+            'top_demands': {'limit': 5},
+            'solutions': {},
+            'negative_comments': {'limit': 3}
+        }, event_url)
+        
         # 事件摘要
-        event = self.get_event_summary()
+        event = data['event_summary']
         if event:
             report.append("\n【事件概况】")
             report.append(f"发布方: {event.get('organization', '未知')}")
@@ -183,7 +378,7 @@ class GraphVisualizer:
             report.append(f"舆论阶段: {event.get('opinion_phase', '未知')}")
         
         # 情感分布
-        sentiment = self.get_sentiment_distribution()
+        sentiment = data['sentiment_distribution']
         if sentiment:
             report.append("\n【情感分布】")
             total = sum(sentiment.values())
@@ -192,7 +387,7 @@ class GraphVisualizer:
                 report.append(f"  {sent}: {count} ({percentage:.1f}%)")
         
         # 主要诉求
-        demands = self.get_top_demands(5)
+        demands = data['top_demands']
         if demands:
             report.append("\n【主要诉求】")
             for i, demand in enumerate(demands, 1):
@@ -201,7 +396,7 @@ class GraphVisualizer:
                 report.append(f"     提及用户数: {demand['user_count']}")
         
         # 解决方案
-        solutions = self.get_solutions()
+        solutions = data['solutions']
         if solutions.get('已采取措施'):
             report.append("\n【已采取措施】")
             for i, action in enumerate(solutions['已采取措施'], 1):
@@ -213,7 +408,7 @@ class GraphVisualizer:
                 report.append(f"  {i}. {suggestion}")
         
         # 负面评论样例
-        negative = self.get_negative_comments(3)
+        negative = data['negative_comments']
         if negative:
             report.append("\n【典型负面评论】")
             for i, comment in enumerate(negative, 1):
@@ -225,16 +420,16 @@ class GraphVisualizer:
         
         return "\n".join(report)
     
-    def export_graph_data(self, output_file: str = "output/graph_data.json"):
-        """导出图谱数据为JSON"""
-        data = {
-            'event_summary': self.get_event_summary(),
-            'sentiment_distribution': self.get_sentiment_distribution(),
-            'top_demands': self.get_top_demands(10),
-            'solutions': self.get_solutions(),
-            'user_interactions': self.get_user_interaction_network(20),
-            'negative_comments': self.get_negative_comments(10)
-        }
+    def export_graph_data(self, output_file: str = "output/graph_data.json", event_url: str = None):
+        """导出某个事件的图谱数据为JSON（默认使用初始化时指定的事件或最近写入的事件）"""
+        data = self.get_sections({
+            'event_summary': {},
+            'sentiment_distribution': {},
+            'top_demands': {'limit': 10},
+            'solutions': {},
+            'user_interactions': {'limit': 20},
+            'negative_comments': {'limit': 10}
+        }, event_url)
         
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
@@ -242,10 +437,269 @@ class GraphVisualizer:
         print(f"图谱数据已导出到: {output_file}")
         return data
     
+    def export_full_graph(self, output_file: str = "output/graph_full.ndjson.gz",
+                          page_size: int = 5000) -> Dict[str, int]:
+        """
+        流式导出全部节点和关系为 NDJSON（文件名以 .gz 结尾时 gzip 压缩）
+        
+        先输出全部节点，再输出全部关系，每行一个 JSON 对象：
+            {"type": "node", "id": "Comment:键", "label": "Comment", "props": {...}}
+            {"type": "relationship", "rel": "发表", "start": "User:名称", "end": "Comment:键", "props": {...}}
+        各标签按唯一键分页查询、逐行写入，内存占用只与 page_size 有关，与图的规模无关。
+        
+        Args:
+            output_file: 输出文件路径
+            page_size: 每页读取的节点数
+        
+        Returns:
+            导出的节点数和关系数
+        """
+        opener = gzip.open if output_file.endswith('.gz') else open
+        counts = {'nodes': 0, 'relationships': 0}
+        
+        with opener(output_file, 'wt', encoding='utf-8') as f:
+            def write(record):
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            
+            for label in EXPORT_KEYS:
+                for record in self._export_pages('export_nodes', EXPORT_NODES_QUERY, label, page_size):
+                    write({'type': 'node', 'id': f"{label}:{record['key']}", 'label': label,
+                           'props': record['props']})
+                    counts['nodes'] += 1
+                print(f"  已导出节点: {counts['nodes']}（{label}）")
+            
+            for label in EXPORT_KEYS:
+                for record in self._export_pages('export_edges', EXPORT_EDGES_QUERY, label, page_size,
+                                                 keys=EXPORT_KEYS):
+                    start = f"{label}:{record['key']}"
+                    for edge in record['edges']:
+                        write({'type': 'relationship', 'rel': edge['type'], 'start': start,
+                               'end': f"{edge['end_label']}:{edge['end_key']}", 'props': edge['props']})
+                        counts['relationships'] += 1
+                print(f"  已导出关系: {counts['relationships']}（起点 {label}）")
+        
+        print(f"全图已导出到: {output_file}")
+        return counts
+    
+    def _export_pages(self, op: str, template: str, label: str, page_size: int, **params):
+        """按唯一键逐页读取某个标签的导出记录（每页一个只读事务），params 为查询的其他参数"""
+        prop = EXPORT_KEYS[label]
+        first = template.format(label=label, prop=prop, condition=f"n.{prop} IS NOT NULL")
+        following = template.format(label=label, prop=prop, condition=f"n.{prop} > $after")
+        after = None
+        while True:
+            page = self.backend.read(op, first if after is None else following,
+                                     label=label, prop=prop, after=after, limit=page_size, **params)
+            yield from page
+            if len(page) < page_size:
+                break
+            after = page[-1]['key']
+    
+    def render_event_html(self, output_file: str = "output/graph_event.html", event_url: str = None,
+                          max_nodes: int = 300, chunk_size: int = 200, user_sample_rate: float = 0.1,
+                          page_size: int = 5000) -> Dict[str, int]:
+        """
+        渲染某个事件的交互式图谱（pyvis HTML，分层展示）
+        
+        概览只包含事件、发布方、舆论阶段、解决方案、度数最高的评论及其诉求和作者，
+        其余评论按情感聚合为一个节点；双击聚合节点时按批加载评论，双击有回复的评论时加载其回复。
+        每批数据预先写入 HTML 旁的分块目录，页面中同时存在的节点数只取决于展开了多少，
+        评论再多也能流畅交互。只发表过一次的用户按 user_sample_rate 抽样显示（作者见评论提示）。
+        
+        评论分两遍分页读取：第一遍统计用户度数并保留度数最高的评论，第二遍边读边写出分块，
+        内存中只有概览、用户度数和每种情感未满一批的评论。
+        
+        Args:
+            output_file: 输出 HTML 路径，分块写入同名的 _chunks 目录
+            event_url: 事件URL，默认使用初始化时指定的事件或最近写入的事件
+            max_nodes: 概览中最多单独显示的评论数和作者数之和（约数）
+            chunk_size: 每次展开加载的评论数
+            user_sample_rate: 低度数用户的显示比例（0-1）
+            page_size: 从图库分页读取评论的每页条数
+        
+        Returns:
+            概览节点数、分块数、评论数和隐藏的低度数用户数
+        """
+        from pyvis.network import Network
+        
+        event_url = self._resolve_event(event_url)
+        summary = self.get_event_summary(event_url)
+        if not summary:
+            print("未找到事件，请先运行 main_pipeline.py 构建图谱")
+            return {}
+        
+        output_dir = os.path.dirname(output_file) or '.'
+        chunk_dir = os.path.splitext(os.path.basename(output_file))[0] + '_chunks'
+        os.makedirs(os.path.join(output_dir, chunk_dir), exist_ok=True)
+        chunk_count = 0
+        
+        def write_chunk(name, chunk):
+            nonlocal chunk_count
+            with open(os.path.join(output_dir, chunk_dir, f"{name}.js"), 'w', encoding='utf-8') as f:
+                f.write(f"graphChunk({json.dumps(chunk.to_dict(), ensure_ascii=False)});\n")
+            chunk_count += 1
+        
+        # 1. 第一遍：统计用户在本事件中的发表数（度数），按度数（回复数 + 诉求数）保留概览中单独显示的评论
+        user_degree = Counter()
+        comment_count = 0
+        
+        def count_threads():
+            nonlocal comment_count
+            for thread in self._iter_comment_threads(event_url, page_size):
+                comment_count += 1
+                user_degree[thread['author']] += 1
+                for reply in thread['replies']:
+                    user_degree[reply['author']] += 1
+                yield thread
+        
+        top = heapq.nlargest(max_nodes // 2, count_threads(),
+                             key=lambda t: len(t['replies']) + len(t['demands']))
+        top_keys = {thread['key'] for thread in top}
+        
+        def user_visible(name):
+            if not name:
+                return False
+            if user_degree[name] > 1:
+                return True
+            bucket = int(hashlib.sha1(name.encode('utf-8')).hexdigest()[:8], 16) / 0xffffffff
+            return bucket < user_sample_rate
+        
+        hidden_users = sum(1 for name in user_degree if name and not user_visible(name))
+        
+        overview = _GraphPart()
+        event_id = f"Event:{event_url}"
+        overview.node(event_id, (summary.get('content') or '事件')[:20], 'Event',
+                      summary.get('content'), value=comment_count)
+        if summary.get('organization'):
+            org_id = f"Organization:{summary['organization']}"
+            overview.node(org_id, summary['organization'], 'Organization')
+            overview.edge(org_id, event_id, '发布')
+        if summary.get('opinion_phase'):
+            overview.node('OpinionPhase', summary['opinion_phase'], 'OpinionPhase')
+            overview.edge(event_id, 'OpinionPhase', '处于')
+        for sol_type, contents in self.get_solutions(event_url).items():
+            for i, content in enumerate(contents):
+                solution_id = f"Solution:{sol_type}:{i}"
+                overview.node(solution_id, content[:20], 'Solution', f"{sol_type}: {content}")
+                overview.edge(solution_id, event_id, '针对' if sol_type == '已采取措施' else '建议针对')
+        
+        pending = {}
+        for i, thread in enumerate(top):
+            comment_id = self._add_thread(overview, thread, event_id, user_visible, with_replies=False)
+            if thread['replies']:
+                chunk = _GraphPart(origin=comment_id)
+                for reply in thread['replies']:
+                    self._add_reply(chunk, reply, comment_id, user_visible)
+                write_chunk(f"t{i}", chunk)
+                pending[comment_id] = [f"t{i}"]
+        del top
+        
+        # 2. 第二遍：其余评论按情感聚合，每攒满 chunk_size 条写出一个展开分块
+        groups = {}   # 情感 -> [分组序号, 评论数, 当前分块]
+        
+        def flush(sentiment):
+            g, count, chunk = groups[sentiment]
+            if chunk.nodes:
+                chunk_name = f"c{g}_{(count - 1) // chunk_size}"
+                write_chunk(chunk_name, chunk)
+                pending[f"Cluster:{sentiment}"].append(chunk_name)
+                groups[sentiment][2] = _GraphPart(origin=f"Cluster:{sentiment}")
+        
+        for thread in self._iter_comment_threads(event_url, page_size):
+            if thread['key'] in top_keys:
+                continue
+            sentiment = thread['sentiment'] or '未知'
+            if sentiment not in groups:
+                groups[sentiment] = [len(groups), 0, _GraphPart(origin=f"Cluster:{sentiment}")]
+                pending[f"Cluster:{sentiment}"] = []
+            group = groups[sentiment]
+            group[1] += 1
+            self._add_thread(group[2], thread, f"Cluster:{sentiment}", user_visible, with_replies=True)
+            if group[1] % chunk_size == 0:
+                flush(sentiment)
+        
+        for sentiment, (g, count, chunk) in groups.items():
+            flush(sentiment)
+            cluster_id = f"Cluster:{sentiment}"
+            label = f"{sentiment}评论 ×{count}"
+            overview.node(cluster_id, label, 'Cluster', f"{label}，双击展开", value=count,
+                          shape='hexagon')
+            overview.edge(cluster_id, event_id, '评论')
+        
+        # 3. 写出 HTML
+        net = Network(height='800px', width='100%', directed=True, cdn_resources='remote',
+                      heading=(summary.get('content') or '')[:40])
+        for node in overview.nodes.values():
+            net.add_node(node['id'], **{k: v for k, v in node.items() if k not in ('id', 'label', 'shape')},
+                         label=node['label'], shape=node['shape'])
+        for edge in overview.edges.values():
+            net.add_edge(edge['from'], edge['to'], **{k: v for k, v in edge.items() if k not in ('from', 'to')})
+        
+        script = LAZY_EXPAND_SCRIPT % {
+            'chunk_dir': json.dumps(chunk_dir),
+            'pending': json.dumps(pending, ensure_ascii=False)
+        }
+        html = net.generate_html().replace('</body>', script + '</body>', 1)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(html)
+        
+        stats = {
+            'overview_nodes': len(overview.nodes),
+            'chunks': chunk_count,
+            'comments': comment_count,
+            'hidden_users': hidden_users
+        }
+        print(f"交互式图谱已生成: {output_file}（概览 {stats['overview_nodes']} 个节点，"
+              f"{stats['chunks']} 个按需加载分块）")
+        return stats
+    
+    def _iter_comment_threads(self, event_url: str, page_size: int):
+        """按评论键前缀分页读取事件的评论线程（每页一个只读事务）"""
+        prefix = KnowledgeGraphBuilder.comment_key_prefix(event_url)
+        after = prefix
+        while True:
+            page = self.backend.read('event_comment_threads', EVENT_COMMENT_THREADS_QUERY,
+                                     prefix=prefix, after=after, limit=page_size)
+            yield from page
+            if len(page) < page_size:
+                break
+            after = page[-1]['key']
+    
+    @staticmethod
+    def _add_thread(part: '_GraphPart', thread: Dict, parent_id: str, user_visible,
+                    with_replies: bool) -> str:
+        """加入一条评论（及其诉求、作者，可选其回复），返回评论节点ID"""
+        comment_id = f"Comment:{thread['key']}"
+        content = thread['content'] or ''
+        title = (f"{thread['author']}（{thread['sentiment']}，强度 {thread['intensity']}）\n{content}"
+                 f"\n回复 {len(thread['replies'])} 条")
+        part.node(comment_id, content[:12], 'Comment', title, value=1 + len(thread['replies']))
+        part.edge(comment_id, parent_id, '评论')
+        for demand in thread['demands']:
+            part.node(f"Demand:{demand}", demand[:16], 'Demand', demand)
+            part.edge(comment_id, f"Demand:{demand}", '包含')
+        if user_visible(thread['author']):
+            part.node(f"User:{thread['author']}", thread['author'], 'User')
+            part.edge(f"User:{thread['author']}", comment_id, '发表')
+        if with_replies:
+            for reply in thread['replies']:
+                GraphVisualizer._add_reply(part, reply, comment_id, user_visible)
+        return comment_id
+    
+    @staticmethod
+    def _add_reply(part: '_GraphPart', reply: Dict, comment_id: str, user_visible):
+        reply_id = f"Reply:{reply['key']}"
+        content = reply['content'] or ''
+        part.node(reply_id, content[:12], 'Reply', f"{reply['author']}\n{content}")
+        part.edge(reply_id, comment_id, '回复')
+        if user_visible(reply['author']):
+            part.node(f"User:{reply['author']}", reply['author'], 'User')
+            part.edge(f"User:{reply['author']}", reply_id, '发表')
+    
     def print_cypher_queries(self):
         """打印常用的Cypher查询语句"""
         queries = [
-            ("查看所有节点与关系(限制关系上限400条)","MATCH (n)-[r]->(m) RETURN n, r, m LIMIT 400"),
+            ("查看所有节点与关系(限制关系上限400条，完整导出请用 export_full_graph)","MATCH (n)-[r]->(m) RETURN n, r, m LIMIT 400"),
             ("查看所有节点类型", "MATCH (n) RETURN DISTINCT labels(n) as node_type, count(*) as count"),
             ("查看事件及其关系", "MATCH (e:Event)-[r]->(n) RETURN e, r, n LIMIT 50"),
             ("查看负面评论", "MATCH (c:Comment) WHERE c.sentiment = '负面' RETURN c LIMIT 20"),
@@ -266,8 +720,51 @@ class GraphVisualizer:
             print()
 
 
+class _GraphPart:
+    """交互式图谱的一部分（概览或一个展开分块）：按ID去重的 vis.js 节点和边"""
+    
+    def __init__(self, origin: str = None):
+        self.origin = origin
+        self.nodes = {}
+        self.edges = {}
+    
+    def node(self, node_id: str, label: str, group: str, title: str = None, value: int = 1,
+             shape: str = 'dot'):
+        if node_id not in self.nodes:
+            self.nodes[node_id] = {'id': node_id, 'label': label, 'baseLabel': label, 'group': group,
+                                   'title': title or label, 'value': value, 'shape': shape}
+    
+    def edge(self, start: str, end: str, rel_type: str):
+        edge_id = f"{start}|{rel_type}|{end}"
+        self.edges[edge_id] = {'id': edge_id, 'from': start, 'to': end, 'title': rel_type}
+    
+    def to_dict(self) -> Dict:
+        return {'origin': self.origin, 'nodes': list(self.nodes.values()), 'edges': list(self.edges.values())}
+
+
 if __name__ == "__main__":
-    visualizer = GraphVisualizer()
+    import sys
+    
+    # 全图导出：python visualizer.py --export-full [输出文件]
+    if len(sys.argv) > 1 and sys.argv[1] == '--export-full':
+        visualizer = GraphVisualizer()
+        try:
+            visualizer.export_full_graph(*sys.argv[2:3])
+        finally:
+            visualizer.close()
+        sys.exit(0)
+    
+    # 交互式图谱：python visualizer.py --render [事件URL]
+    if len(sys.argv) > 1 and sys.argv[1] == '--render':
+        visualizer = GraphVisualizer(event_url=sys.argv[2] if len(sys.argv) > 2 else None)
+        try:
+            visualizer.render_event_html()
+        finally:
+            visualizer.close()
+        sys.exit(0)
+    
+    # 可选参数：事件URL，默认使用最近写入的事件
+    visualizer = GraphVisualizer(event_url=sys.argv[1] if len(sys.argv) > 1 else None)
     
     try:
         # 生成报告